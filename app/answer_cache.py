@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    answer: str
+    vector: Optional[np.ndarray]
+    created_at: float
+
+
+class AnswerCache:
+    """LRU cache of agent answers keyed by question, with near-duplicate matching.
+
+    A question hits the cache when its normalized text matches a stored one, or
+    when the cosine similarity of its query embedding to a stored question's
+    embedding is at least `similarity_threshold`. Entries expire after
+    `ttl_seconds` and the least recently used entry is evicted beyond
+    `max_entries`.
+
+    `invalidate` only reaches this process. `shared_generation` returns a
+    counter that every worker bumps when documents change; the cache checks it
+    on each lookup and drops its entries when another worker has moved it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        shared_generation: Optional[Callable[[], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.shared_generation = shared_generation
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._seen_shared = shared_generation() if shared_generation else None
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return " ".join(question.lower().split()).strip(" ?!.")
+
+    @property
+    def generation(self) -> int:
+        """Incremented on every invalidation; answers computed under an older generation are not stored."""
+        with self._lock:
+            self._sync()
+            return self._generation
+
+    def _sync(self):
+        """Drop every entry if another worker changed the documents; call with the lock held."""
+        if self.shared_generation is None:
+            return
+        shared = self.shared_generation()
+        if shared != self._seen_shared:
+            self._entries.clear()
+            self._generation += 1
+            self._seen_shared = shared
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def get(self, question: str) -> Optional[str]:
+        """Return the cached answer for an exact (normalized) match."""
+        key = self.normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.answer
+
+    def get_similar(self, vector: List[float]) -> Optional[str]:
+        """Return the cached answer of the most similar stored question above the threshold."""
+        query = _normalize_vector(vector)
+        now = time.monotonic()
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            self._sync()
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry, now):
+                    del self._entries[key]
+                    continue
+                if entry.vector is None:
+                    continue
+                score = float(np.dot(query, entry.vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            logger.debug(f"Answer cache near-duplicate hit (similarity {best_score:.3f})")
+            return self._entries[best_key].answer
+
+    def put(self, question: str, vector: Optional[List[float]], answer: str, generation: int):
+        with self._lock:
+            self._sync()
+            if generation != self._generation:
+                return
+            key = self.normalize(question)
+            self._entries[key] = _Entry(
+                answer=answer,
+                vector=_normalize_vector(vector) if vector is not None else None,
+                created_at=time.monotonic()
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            if self.shared_generation is not None:
+                self._seen_shared = self.shared_generation()
+
+
+def _normalize_vector(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one shared execution."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            logger.debug(f"Joining in-flight query for {key!r}")
+        # A caller that goes away must not cancel the work other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved in case every waiter went away
+            task.exception()
@@ -9,8 +9,60 @@ class Settings(BaseSettings):
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     model_name: str = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "openai")  # openai | local
+    local_embedding_model: str = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    local_embedding_batch_size: int = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+    local_embedding_threads: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))  # 0 = one per CPU
+    local_embedding_max_wait_ms: float = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", "5"))
     chroma_persist_directory: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma")
+    chroma_collection_name: str = os.getenv("CHROMA_COLLECTION_NAME", "langchain")
+    embedding_cache_directory: str = os.getenv("EMBEDDING_CACHE_DIRECTORY", "./data/embedding_cache")
+    pdf_extraction_workers: int = int(os.getenv("PDF_EXTRACTION_WORKERS", "0"))  # 0 = one per CPU
+    vector_index_backend: str = os.getenv("VECTOR_INDEX_BACKEND", "chroma")
+    vector_index_directory: str = os.getenv("VECTOR_INDEX_DIRECTORY", "./data/vector_index")
+    vector_index_dtype: str = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+    vector_index_compact_ratio: float = float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.25"))
+    vector_write_batch_rows: int = int(os.getenv("VECTOR_WRITE_BATCH_ROWS", "500"))
+    vector_write_max_delay_ms: float = float(os.getenv("VECTOR_WRITE_MAX_DELAY_MS", "50"))
+    uploads_directory: str = os.getenv("UPLOADS_DIRECTORY", "uploads")
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "2"))
+    ingest_embed_batch_size: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "128"))
+    ingest_embed_concurrency: int = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
     brave_search_api_key: str = os.getenv("BRAVE_SEARCH_API_KEY", "")
+    brave_search_api_url: str = os.getenv("BRAVE_SEARCH_API_URL", "https://api.search.brave.com/res/v1/web/search")
+    brave_timeout_seconds: float = float(os.getenv("BRAVE_TIMEOUT_SECONDS", "10"))
+    brave_max_retries: int = int(os.getenv("BRAVE_MAX_RETRIES", "3"))
+    brave_rate_limit_per_second: float = float(os.getenv("BRAVE_RATE_LIMIT_PER_SECOND", "1"))
+    brave_rate_limit_burst: float = float(os.getenv("BRAVE_RATE_LIMIT_BURST", "1"))
+    brave_cache_ttl_seconds: float = float(os.getenv("BRAVE_CACHE_TTL_SECONDS", "600"))
+    brave_cache_max_entries: int = int(os.getenv("BRAVE_CACHE_MAX_ENTRIES", "1024"))
+    brave_pool_size: int = int(os.getenv("BRAVE_POOL_SIZE", "10"))
+    hybrid_retrieval_enabled: bool = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+    hybrid_lexical_min_score: float = float(os.getenv("HYBRID_LEXICAL_MIN_SCORE", "10"))
+    hybrid_lexical_margin: float = float(os.getenv("HYBRID_LEXICAL_MARGIN", "1.5"))
+    query_router_enabled: bool = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() == "true"
+    router_document_min_score: float = float(os.getenv("ROUTER_DOCUMENT_MIN_SCORE", "5"))
+    history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+    retrieval_candidates: int = int(os.getenv("RETRIEVAL_CANDIDATES", "8"))
+    context_mmr_lambda: float = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    answer_cache_max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+    answer_cache_ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    answer_cache_similarity_threshold: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    session_backend: str = os.getenv("SESSION_BACKEND", "sqlite")
+    sessions_directory: str = os.getenv("SESSIONS_DIRECTORY", "sessions")
+    session_database_path: str = os.getenv("SESSION_DATABASE_PATH", "")
+    session_migrate_files: bool = os.getenv("SESSION_MIGRATE_FILES", "false").lower() == "true"
+    session_cache_max_sessions: int = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "1024"))
+    session_cache_max_bytes: int = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    session_fsync_policy: str = os.getenv("SESSION_FSYNC_POLICY", "interval")
+    session_fsync_interval_seconds: float = float(os.getenv("SESSION_FSYNC_INTERVAL_SECONDS", "1"))
+    embedding_token_metrics: bool = os.getenv("EMBEDDING_TOKEN_METRICS", "false").lower() == "true"
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    warmup_on_startup: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+    max_concurrent_llm_calls: int = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "8"))
+    request_timeout_seconds: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
 
     class Config:
         env_file = ".env"
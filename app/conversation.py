@@ -0,0 +1,160 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+
+from app.lexical_index import tokenize
+from app.tokens import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Session log records with this role hold the rolling summary, not a chat message
+SUMMARY_ROLE = "summary"
+
+
+def format_turns(messages: Sequence[Dict[str, str]]) -> str:
+    lines = []
+    for message in messages:
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"{speaker}: {message.get('content', '')}")
+    return "\n".join(lines)
+
+
+def split_history(messages: Sequence[Dict[str, str]]) -> Tuple[str, int, List[Dict[str, str]]]:
+    """Separate a session log into (latest summary, number of turns it covers, chat turns)."""
+    summary, covers = "", 0
+    turns = []
+    for message in messages:
+        if message.get("role") == SUMMARY_ROLE:
+            summary, covers = message.get("content", ""), message.get("covers", 0)
+        else:
+            turns.append(message)
+    return summary, covers, turns
+
+
+@dataclass
+class ConversationContext:
+    history: str = ""
+    last_user_message: Optional[str] = None
+    # New summary to append to the session log, if this build produced one
+    summary_record: Optional[Dict] = None
+
+
+class ConversationContextBuilder:
+    """Turns a session log into prompt history that fits in `token_budget` tokens.
+
+    Turns since the last summary are kept verbatim while they fit. Once they
+    overflow the budget, the older ones are folded into the rolling summary
+    with one LLM call, keeping the newest turns verbatim within `recent_share`
+    of the budget. The new summary is returned for the caller to store in the
+    session log, so later turns start from it instead of re-summarizing.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, str], Awaitable[str]],
+        token_budget: int,
+        model_name: str,
+        recent_share: float = 0.5
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.model_name = model_name
+        self.recent_share = recent_share
+
+    def _tokens(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def _fit_recent(self, turns: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+        kept: List[Dict[str, str]] = []
+        used = 0
+        for message in reversed(turns):
+            cost = self._tokens(format_turns([message]))
+            if used + cost > budget:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        return kept
+
+    async def build(self, messages: Sequence[Dict[str, str]]) -> ConversationContext:
+        summary, covers, turns = split_history(messages)
+        if not turns:
+            return ConversationContext()
+        pending = turns[covers:]
+        last_user_message = next((m.get("content") for m in reversed(turns) if m.get("role") == "user"), None)
+
+        summary_record = None
+        if self._tokens(summary) + self._tokens(format_turns(pending)) > self.token_budget:
+            recent = self._fit_recent(pending, int(self.token_budget * self.recent_share))
+            folded = pending[:len(pending) - len(recent)]
+            summary = await self.summarize(summary, format_turns(folded))
+            covers += len(folded)
+            summary_record = {"role": SUMMARY_ROLE, "content": summary, "covers": covers}
+            pending = recent
+            logger.debug(f"Folded {len(folded)} messages into the conversation summary")
+
+        # A summary that alone exceeds the budget leaves no room for verbatim turns
+        pending = self._fit_recent(pending, self.token_budget - self._tokens(summary))
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation: {summary}")
+        if pending:
+            parts.append(format_turns(pending))
+        return ConversationContext(
+            history="\n".join(parts),
+            last_user_message=last_user_message,
+            summary_record=summary_record
+        )
+
+
+def _term_vector(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b.get(term, 0) for term, count in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def select_context(
+    docs: Sequence["Document"],
+    token_budget: int,
+    model_name: str,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = 0.9
+) -> List["Document"]:
+    """Pick retrieved chunks for the prompt with maximal marginal relevance.
+
+    Relevance is the retriever's ranking; redundancy is term-vector cosine
+    similarity to chunks already picked. Near-duplicates (e.g. overlapping
+    chunks) are dropped and chunks are added until `token_budget` is spent.
+    """
+    if not docs:
+        return []
+    vectors = [_term_vector(doc.page_content) for doc in docs]
+    costs = [count_tokens(doc.page_content, model_name) for doc in docs]
+    relevance = [1.0 - rank / len(docs) for rank in range(len(docs))]
+
+    selected: List[int] = []
+    remaining = list(range(len(docs)))
+    used = 0
+    while remaining:
+        best, best_score, best_redundancy = None, -math.inf, 0.0
+        for i in remaining:
+            redundancy = max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score, best_redundancy = i, score, redundancy
+        remaining.remove(best)
+        if best_redundancy >= duplicate_threshold or used + costs[best] > token_budget:
+            continue
+        selected.append(best)
+        used += costs[best]
+    return [docs[i] for i in selected]
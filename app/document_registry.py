@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.embedding_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Ids per IN (...) clause, below SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    content_hash TEXT,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_by_document ON chunks (document_id);
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0);
+"""
+
+
+def document_id_for(filename: str) -> str:
+    """Stable document id derived from the filename."""
+    return content_hash(filename)[:16]
+
+
+@dataclass
+class DocumentRecord:
+    document_id: str
+    filename: str
+    chunk_ids: List[str] = field(default_factory=list)
+    content_hash: Optional[str] = None
+    ingested_at: float = field(default_factory=time.time)
+    # Records from DocumentRegistry.list() carry only the count, not the ids
+    chunk_count: Optional[int] = None
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        if self.chunk_count is None:
+            data["chunk_count"] = len(self.chunk_ids)
+        data.pop("chunk_ids")
+        return data
+
+
+class DocumentRegistry:
+    """Maps documents to their chunk ids, stored in a SQLite database (WAL mode) next to the Chroma data.
+
+    Lets a whole document be deleted or replaced with a single bulk delete
+    instead of listing every chunk in the collection first. Each change is a
+    small transaction touching only the affected rows, and nothing is cached
+    in memory, so worker processes sharing the file always agree. A registry
+    saved by older versions as JSON at `legacy_path` is imported on first use.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, busy_timeout_seconds: float = 30.0):
+        self.path = path
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._local = threading.local()
+        self.exists_on_disk = os.path.exists(path) or bool(legacy_path and os.path.exists(legacy_path))
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        if legacy_path and os.path.exists(legacy_path):
+            self._import_json(legacy_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _import_json(self, legacy_path: str):
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            records = [DocumentRecord(**data) for data in json.load(f)]
+        with self._transaction() as connection:
+            for record in records:
+                connection.execute(
+                    "INSERT OR REPLACE INTO documents (document_id, filename, content_hash, ingested_at) VALUES (?, ?, ?, ?)",
+                    (record.document_id, record.filename, record.content_hash, record.ingested_at)
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO chunks (chunk_id, document_id) VALUES (?, ?)",
+                    [(chunk_id, record.document_id) for chunk_id in record.chunk_ids]
+                )
+        os.replace(legacy_path, legacy_path + ".migrated")
+        logger.info(f"Imported {len(records)} documents from {legacy_path} into {self.path}")
+
+    def list(self) -> List[DocumentRecord]:
+        """Every document with its chunk count; chunk ids are not loaded."""
+        rows = self._connection().execute(
+            "SELECT d.document_id, d.filename, d.content_hash, d.ingested_at, COALESCE(c.chunk_count, 0) "
+            "FROM documents d LEFT JOIN "
+            "(SELECT document_id, COUNT(*) AS chunk_count FROM chunks GROUP BY document_id) c "
+            "ON c.document_id = d.document_id ORDER BY d.ingested_at"
+        )
+        return [
+            DocumentRecord(document_id=row[0], filename=row[1], content_hash=row[2], ingested_at=row[3], chunk_count=row[4])
+            for row in rows
+        ]
+
+    def get(self, document_id: str) -> Optional[DocumentRecord]:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT document_id, filename, content_hash, ingested_at FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        chunk_ids = [chunk_row[0] for chunk_row in connection.execute(
+            "SELECT chunk_id FROM chunks WHERE document_id = ? ORDER BY rowid", (document_id,)
+        )]
+        return DocumentRecord(
+            document_id=row[0], filename=row[1], chunk_ids=chunk_ids, content_hash=row[2], ingested_at=row[3],
+            chunk_count=len(chunk_ids)
+        )
+
+    def find_by_filename(self, filename: str) -> Optional[DocumentRecord]:
+        return self.get(document_id_for(filename))
+
+    def record_chunks(self, filename: str, chunk_ids: Iterable[str], content_hash: Optional[str] = None):
+        """Attach chunk ids to a document, creating its record if needed."""
+        document_id = document_id_for(filename)
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO documents (document_id, filename, content_hash, ingested_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (document_id) DO UPDATE SET "
+                "content_hash = COALESCE(excluded.content_hash, documents.content_hash), ingested_at = excluded.ingested_at",
+                (document_id, filename, content_hash, time.time())
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, document_id) VALUES (?, ?)",
+                [(chunk_id, document_id) for chunk_id in dict.fromkeys(chunk_ids)]
+            )
+
+    def remove(self, document_id: str) -> Optional[DocumentRecord]:
+        record = self.get(document_id)
+        if record is not None:
+            with self._transaction() as connection:
+                connection.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+                connection.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+        return record
+
+    def remove_chunk_ids(self, chunk_ids: Iterable[str]):
+        """Forget individual chunks; documents left without chunks are dropped."""
+        chunk_ids = list(chunk_ids)
+        with self._transaction() as connection:
+            touched = set()
+            for start in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                touched.update(row[0] for row in connection.execute(
+                    f"SELECT DISTINCT document_id FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ))
+                connection.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+            for document_id in touched:
+                connection.execute(
+                    "DELETE FROM documents WHERE document_id = ? "
+                    "AND NOT EXISTS (SELECT 1 FROM chunks WHERE document_id = ?)",
+                    (document_id, document_id)
+                )
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM chunks")
+            connection.execute("DELETE FROM documents")
+
+    def generation(self) -> int:
+        """Counter bumped after every committed change to the stored documents, shared by all workers."""
+        return self._connection().execute("SELECT value FROM generation").fetchone()[0]
+
+    def bump_generation(self):
+        with self._transaction() as connection:
+            connection.execute("UPDATE generation SET value = value + 1")
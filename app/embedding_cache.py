@@ -0,0 +1,92 @@
+from array import array
+from typing import List, Tuple
+import hashlib
+import logging
+
+from langchain.storage import LocalFileStore
+from langchain_core.embeddings import Embeddings
+
+from app import tokens
+from app.metrics import CACHE_REQUESTS, EMBEDDING_TEXTS, EMBEDDING_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(*parts: str) -> str:
+    """Stable hex digest of one or more strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that keeps document vectors in a persistent on-disk cache.
+
+    Vectors are keyed by a hash of the embedding model name and the chunk text,
+    so the same chunk is only ever sent to the embedding API once per model.
+    """
+
+    def __init__(self, underlying: Embeddings, cache_directory: str, namespace: str, count_tokens: bool = False):
+        self.underlying = underlying
+        self.namespace = namespace
+        # Tokenizing every embedded text only feeds a metric, so it is opt-in
+        self.count_tokens = count_tokens
+        self.store = LocalFileStore(cache_directory)
+
+    def _record_model_call(self, texts: List[str], kind: str):
+        EMBEDDING_TEXTS.inc(len(texts), kind=kind, source="model")
+        if self.count_tokens:
+            EMBEDDING_TOKENS.inc(sum(tokens.count_tokens(text, self.namespace) for text in texts), model=self.namespace)
+
+    def _key(self, text: str) -> str:
+        return content_hash(self.namespace, text)
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("d", vector).tobytes()
+
+    @staticmethod
+    def _decode(raw: bytes) -> List[float]:
+        vector = array("d")
+        vector.frombytes(raw)
+        return vector.tolist()
+
+    def embed_documents_with_stats(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        """Embed texts, returning the vectors and how many came from the cache."""
+        keys = [self._key(text) for text in texts]
+        cached = self.store.mget(keys)
+        vectors = [self._decode(raw) if raw is not None else None for raw in cached]
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+
+        if missing:
+            self._record_model_call(list(missing.values()), "document")
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            by_key = dict(zip(missing.keys(), new_vectors))
+            self.store.mset([(key, self._encode(vector)) for key, vector in by_key.items()])
+            vectors = [vector if vector is not None else by_key[keys[i]] for i, vector in enumerate(vectors)]
+
+        hits = len(texts) - sum(1 for raw in cached if raw is None)
+        CACHE_REQUESTS.inc(hits, cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(texts) - hits, cache="embedding", result="miss")
+        EMBEDDING_TEXTS.inc(hits, kind="document", source="cache")
+        logger.debug(f"Embedding cache: {hits} hits, {len(missing)} newly embedded")
+        return vectors, hits
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, _ = self.embed_documents_with_stats(texts)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self._record_model_call([text], "query")
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self._record_model_call([text], "query")
+        return await self.underlying.aembed_query(text)
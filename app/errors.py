@@ -0,0 +1,2 @@
+class QueryTimeoutError(Exception):
+    pass
@@ -0,0 +1,71 @@
+from typing import Any, Dict, List, Tuple
+import logging
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists into one, scoring each id by sum(1 / (k + rank))."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class VectorRetriever(BaseRetriever):
+    """Retrieves the k chunks closest to the query embedding, whichever vector index backend is configured."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vector_store.vector_search(query, self.k)
+
+
+class HybridRetriever(BaseRetriever):
+    """Retrieves chunks by fusing BM25 and vector search results with reciprocal rank fusion.
+
+    When the keyword scores are decisive (the best BM25 score is at least
+    `lexical_min_score` and `lexical_margin` times the runner-up) the lexical
+    results are returned directly and no query embedding is computed.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    k: int = 4
+    rrf_k: int = 60
+    lexical_min_score: float = 10.0
+    lexical_margin: float = 1.5
+
+    def _lexical_is_decisive(self, lexical: List[Tuple[str, float]]) -> bool:
+        if not lexical or lexical[0][1] < self.lexical_min_score:
+            return False
+        return len(lexical) == 1 or lexical[0][1] >= self.lexical_margin * lexical[1][1]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.k * 2
+        lexical = self.vector_store.lexical_search(query, candidates)
+        if self._lexical_is_decisive(lexical):
+            logger.debug(f"Lexical fast path for query {query!r}")
+            return self.vector_store.get_documents([chunk_id for chunk_id, _ in lexical[:self.k]])
+
+        vector = self.vector_store.vector_search(query, candidates)
+        fused = reciprocal_rank_fusion(
+            [[chunk_id for chunk_id, _ in lexical], [doc.id for doc in vector]],
+            k=self.rrf_k
+        )[:self.k]
+
+        by_id = {doc.id: doc for doc in vector}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        if missing:
+            by_id.update({doc.id: doc for doc in self.vector_store.get_documents(missing)})
+        return [by_id[chunk_id] for chunk_id, _ in fused if chunk_id in by_id]
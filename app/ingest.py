@@ -0,0 +1,186 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import codecs
+import logging
+import os
+
+from chardet.universaldetector import UniversalDetector
+from fastapi import UploadFile
+
+from app.config import get_settings
+from app.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+UPLOAD_READ_SIZE = 64 * 1024
+ENCODING_SNIFF_BYTES = 64 * 1024
+FALLBACK_ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
+# chardet guesses below this confidence are ignored in favour of FALLBACK_ENCODINGS
+MIN_DETECTION_CONFIDENCE = 0.5
+# Smallest page range handed to a single worker process
+MIN_PAGES_PER_TASK = 8
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def encoding_candidates(prefix: bytes, detection: dict) -> List[str]:
+    """Encodings to try in order, keeping only those that can decode the sniffed prefix.
+
+    UTF-8 comes first: text with non-ASCII bytes that happens to be valid UTF-8
+    almost always is. chardet's guess follows when it is confident. It reports
+    "ascii" for a plain ASCII prefix, which says nothing about the rest of the
+    file, so that is read as UTF-8 as well.
+    """
+    names = ["utf-8"]
+    if detection.get("encoding") and (detection.get("confidence") or 0) >= MIN_DETECTION_CONFIDENCE:
+        names.append(detection["encoding"])
+    candidates = []
+    for name in names + FALLBACK_ENCODINGS:
+        try:
+            encoding = codecs.lookup(name).name
+            if encoding == "ascii":
+                encoding = "utf-8"
+            # The prefix may end in the middle of a multi-byte character
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        if encoding not in candidates:
+            candidates.append(encoding)
+    return candidates
+
+
+def _detect(prefix: bytes) -> dict:
+    detector = UniversalDetector()
+    detector.feed(prefix)
+    detector.close()
+    return detector.result
+
+
+def read_text_file(path: str) -> str:
+    """Read a text file from disk with the first candidate encoding that decodes all of it."""
+    with open(path, "rb") as f:
+        data = f.read()
+    for encoding in encoding_candidates(data[:ENCODING_SNIFF_BYTES], _detect(data[:ENCODING_SNIFF_BYTES])):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            logger.debug(f"{path} is not valid {encoding}, trying the next encoding")
+    raise ValueError("Could not decode the file with any supported encoding")
+
+
+async def iter_upload_text(file: UploadFile) -> AsyncIterator[str]:
+    """Decode an uploaded text file piece by piece without reading it all into memory.
+
+    The encoding is guessed from the first ENCODING_SNIFF_BYTES of the upload
+    and the whole upload is decoded strictly. If a later byte does not decode,
+    the upload is re-read from the start with the next candidate encoding,
+    skipping the text already yielded. That text is only safe to keep while it
+    is all ASCII, which every candidate decodes the same way; otherwise the
+    upload is rejected with ValueError rather than stored with mixed encodings.
+    """
+    detector = UniversalDetector()
+    prefix = b""
+    while len(prefix) < ENCODING_SNIFF_BYTES:
+        block = await file.read(UPLOAD_READ_SIZE)
+        if not block:
+            break
+        prefix += block
+        detector.feed(block)
+        if detector.done:
+            break
+    detector.close()
+
+    emitted = 0
+    ascii_only = True
+    for encoding in encoding_candidates(prefix, detector.result):
+        logger.debug(f"Decoding {file.filename} as {encoding}")
+        await file.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        skip = emitted
+        try:
+            final = False
+            while not final:
+                block = await file.read(UPLOAD_READ_SIZE)
+                final = not block
+                text = decoder.decode(block, final=final)
+                if skip:
+                    dropped = min(skip, len(text))
+                    text = text[dropped:]
+                    skip -= dropped
+                if text:
+                    ascii_only = ascii_only and text.isascii()
+                    emitted += len(text)
+                    yield text
+            return
+        except UnicodeDecodeError as e:
+            if not ascii_only:
+                raise ValueError(
+                    f"{file.filename} is not valid {encoding} after its first {emitted} characters"
+                ) from e
+            logger.debug(f"{file.filename} is not valid {encoding}, retrying with the next encoding")
+    raise ValueError("Could not decode the file with any supported encoding")
+
+
+def pdf_worker_count() -> int:
+    return settings.pdf_extraction_workers or os.cpu_count() or 1
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=pdf_worker_count())
+    return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(cancel_futures=True)
+        _pdf_pool = None
+
+
+def _count_pdf_pages(path: str) -> int:
+    # PyPDF2 is imported on first use; it is a noticeable part of the app's import time
+    from PyPDF2 import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text from pages [start, end) of a PDF. Runs in a worker process."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    pages = []
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text()
+            if text:  # Only add non-empty text
+                pages.append((index + 1, text))
+        except Exception as e:
+            logger.error(f"Error extracting text from page {index + 1}: {str(e)}")
+            continue
+    return pages
+
+
+async def extract_pdf_pages(path: str) -> List[Tuple[int, str]]:
+    """Extract (page_number, text) pairs from a PDF, in page order, using the process pool."""
+    try:
+        with stage("pdf_extraction"):
+            page_count = await asyncio.to_thread(_count_pdf_pages, path)
+            pool = get_pdf_pool()
+            pages_per_task = max(MIN_PAGES_PER_TASK, -(-page_count // (pdf_worker_count() * 2)))
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, _extract_page_range, path, start, min(start + pages_per_task, page_count))
+                for start in range(0, page_count, pages_per_task)
+            ])
+    except Exception as e:
+        raise ValueError(f"Error processing PDF: {str(e)}")
+
+    pages = [page for result in results for page in result]
+    if not pages:
+        raise ValueError("No text could be extracted from the PDF")
+    logger.debug(f"Extracted {len(pages)} of {page_count} PDF pages")
+    return pages
@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import shutil
+import time
+import uuid
+
+from app.ingest import extract_pdf_pages, read_text_file
+
+if TYPE_CHECKING:
+    from app.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Completed jobs kept around for status queries
+MAX_TRACKED_JOBS = 1000
+
+
+@dataclass
+class FileProgress:
+    filename: str
+    path: str
+    content_type: Optional[str] = None
+    # queued -> extracted -> chunked -> embedded -> persisted, or failed
+    status: str = "queued"
+    chunks: int = 0
+    embedded_chunks: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestJob:
+    id: str
+    files: List[FileProgress]
+    # queued -> running -> completed (some files may have failed) or failed
+    status: str = "queued"
+    stats: Dict[str, int] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    cleanup_directory: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("cleanup_directory")
+        for file in data["files"]:
+            file.pop("path")
+        return data
+
+
+class IngestJobQueue:
+    """Runs document ingestion in the background and tracks per-file progress.
+
+    Each job extracts and splits its files concurrently, then embeds the chunks
+    of all its files together in batches of `embed_batch_size`, with at most
+    `embed_concurrency` batches in flight, and persists once at the end.
+    """
+
+    def __init__(
+        self,
+        get_vector_store: Callable[[], "VectorStore"],
+        workers: int = 2,
+        embed_batch_size: int = 128,
+        embed_concurrency: int = 4,
+    ):
+        self.get_vector_store = get_vector_store
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def vector_store(self) -> "VectorStore":
+        return self.get_vector_store()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, files: List[Tuple[str, str, Optional[str]]], cleanup_directory: Optional[str] = None) -> IngestJob:
+        """Queue (path, filename, content_type) files for ingestion.
+
+        Safe to call from the event loop or from a worker thread.
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingest job queue has not been started")
+        job = IngestJob(
+            id=str(uuid.uuid4()),
+            files=[FileProgress(filename=name, path=path, content_type=content_type) for path, name, content_type in files],
+            cleanup_directory=cleanup_directory
+        )
+        self._jobs[job.id] = job
+        while len(self._jobs) > MAX_TRACKED_JOBS:
+            self._jobs.popitem(last=False)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._queue.put_nowait(job)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Ingest job {job.id} failed: {str(e)}")
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                if job.cleanup_directory:
+                    shutil.rmtree(job.cleanup_directory, ignore_errors=True)
+                self._queue.task_done()
+
+    async def _prepare(self, file: FileProgress) -> Tuple[List[str], List[dict], List[str], List[dict]]:
+        """Extract and split a file. Returns its chunks and their metadata, then its texts and theirs."""
+        metadata = {"filename": file.filename, "content_type": file.content_type or ""}
+        if file.filename.lower().endswith(".pdf"):
+            pages = await extract_pdf_pages(file.path)
+            texts = [text for _, text in pages]
+            metadatas = [{**metadata, "page": page_number} for page_number, _ in pages]
+        else:
+            texts = [await asyncio.to_thread(read_text_file, file.path)]
+            metadatas = [metadata]
+        file.status = "extracted"
+
+        chunks, chunk_metadatas = await asyncio.to_thread(self.vector_store.split_documents, texts, metadatas)
+        if not chunks:
+            raise ValueError("No text could be extracted from the file")
+        file.chunks = len(chunks)
+        file.status = "chunked"
+        return chunks, chunk_metadatas, texts, metadatas
+
+    async def _run(self, job: IngestJob):
+        from app.vector_store import merge_stats
+
+        job.status = "running"
+        # The vector store may not be built yet; do that off the event loop
+        await asyncio.to_thread(self.get_vector_store)
+        prepared = await asyncio.gather(*[self._prepare(file) for file in job.files], return_exceptions=True)
+
+        # Batch chunks across files so small files share embedding requests
+        batches: List[List[Tuple[FileProgress, str, dict]]] = [[]]
+        for file, result in zip(job.files, prepared):
+            if isinstance(result, BaseException):
+                file.status = "failed"
+                file.error = str(result)
+                continue
+            for chunk, metadata in zip(result[0], result[1]):
+                if len(batches[-1]) >= self.embed_batch_size:
+                    batches.append([])
+                batches[-1].append((file, chunk, metadata))
+
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+
+        async def embed(batch: List[Tuple[FileProgress, str, dict]]):
+            async with semaphore:
+                batch = [item for item in batch if item[0].status != "failed"]
+                if not batch:
+                    return
+                try:
+                    stats = await asyncio.to_thread(
+                        self.vector_store.add_chunks,
+                        [chunk for _, chunk, _ in batch],
+                        [metadata for _, _, metadata in batch]
+                    )
+                except Exception as e:
+                    for file, _, _ in batch:
+                        file.status = "failed"
+                        file.error = str(e)
+                    return
+                merge_stats(job.stats, stats)
+                for file, _, _ in batch:
+                    file.embedded_chunks += 1
+                    if file.embedded_chunks == file.chunks and file.status != "failed":
+                        file.status = "embedded"
+
+        await asyncio.gather(*[embed(batch) for batch in batches if batch])
+
+        await asyncio.to_thread(self.vector_store.persist)
+        for file, result in zip(job.files, prepared):
+            if file.status == "embedded":
+                # Only now that all its chunks are stored may a re-upload treat the file as unchanged
+                await asyncio.to_thread(self.vector_store.record_document_hashes, result[2], result[3])
+                file.status = "persisted"
+        job.status = "completed" if any(file.status == "persisted" for file in job.files) else "failed"
+        logger.debug(f"Ingest job {job.id} finished with status {job.status}")
@@ -0,0 +1,63 @@
+from typing import Callable, Generic, Optional, TypeVar
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyComponent(Generic[T]):
+    """Builds an expensive component on first use, exactly once, from any thread.
+
+    Lets the app start serving (and answer `/health`) before clients such as
+    the vector store and the LLM are constructed. `aget` builds on a worker
+    thread so the event loop is never blocked; `warm_up` does the same ahead
+    of the first request. If construction fails, the next call retries.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        self.factory = factory
+        self.name = name
+        self.error: Optional[BaseException] = None
+        self.build_seconds: Optional[float] = None
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def peek(self) -> Optional[T]:
+        """The component if it has been built, without building it."""
+        return self._value
+
+    def get(self) -> T:
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except BaseException as e:
+                    self.error = e
+                    raise
+                self.error = None
+                self.build_seconds = time.perf_counter() - start
+                logger.info(f"Initialized {self.name} in {self.build_seconds:.2f}s")
+        return self._value
+
+    async def aget(self) -> T:
+        if self._value is not None:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    async def warm_up(self):
+        """Build in the background; failures are logged and retried on first use."""
+        try:
+            await self.aget()
+        except Exception as e:
+            logger.error(f"Warm-up of {self.name} failed: {str(e)}")
@@ -0,0 +1,241 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writer process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over chunks, persisted as a JSON snapshot plus an append-only delta log.
+
+    Only the per-chunk term counts are written to disk; the postings lists are
+    rebuilt from them on load. `save` appends the changes made since the last
+    save to `<path>.log`, so a commit costs time proportional to the change,
+    not to the corpus. Once the log outgrows the snapshot (and on `snapshot`),
+    the snapshot is rewritten and the log emptied.
+
+    Several worker processes may share the files: writers serialize on an
+    flock'd lock file, and `search` first replays entries other processes have
+    appended, or reloads everything if the snapshot was rewritten.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75, min_snapshot_log_bytes: int = 1024 * 1024):
+        self.path = path
+        self.log_path = path + ".log"
+        self.k1 = k1
+        self.b = b
+        self.min_snapshot_log_bytes = min_snapshot_log_bytes
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        # Changes not yet written to the log, as log entries
+        self._pending: List[dict] = []
+        self._snapshot_stamp: Optional[Tuple[int, int]] = None
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        with self._lock:
+            self._reload()
+
+    @property
+    def exists_on_disk(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.log_path)
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat_snapshot(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def _reload(self):
+        """Rebuild the in-memory index from the snapshot and the whole log."""
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._postings.clear()
+        self._total_length = 0
+        self._snapshot_stamp = self._stat_snapshot()
+        if self._snapshot_stamp is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for chunk_id, terms in json.load(f).items():
+                    self._index(chunk_id, terms)
+        self._log_offset = 0
+        self._replay_log()
+        for entry in self._pending:
+            self._apply(entry)
+
+    def _replay_log(self):
+        """Apply complete log entries past the last offset read."""
+        if self._log_size() <= self._log_offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._apply(json.loads(line))
+                self._log_offset += len(line)
+
+    def _catch_up(self) -> bool:
+        """Pick up writes by other processes; returns True if anything changed."""
+        if self._stat_snapshot() != self._snapshot_stamp or self._log_size() < self._log_offset:
+            self._reload()
+            return True
+        if self._log_size() > self._log_offset:
+            self._replay_log()
+            # Local changes not saved yet stay on top of what others wrote
+            for entry in self._pending:
+                self._apply(entry)
+            return True
+        return False
+
+    def _apply(self, entry: dict):
+        if "clear" in entry:
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._postings.clear()
+            self._total_length = 0
+        for chunk_id in entry.get("remove", ()):
+            self._unindex(chunk_id)
+        for chunk_id, terms in entry.get("add", {}).items():
+            self._unindex(chunk_id)
+            self._index(chunk_id, terms)
+
+    def _index(self, chunk_id: str, terms: Dict[str, int]):
+        self._doc_terms[chunk_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[chunk_id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+
+    def _unindex(self, chunk_id: str):
+        terms = self._doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(chunk_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, items: Iterable[Tuple[str, str]]):
+        """Index (chunk_id, text) pairs, replacing chunks that are already indexed."""
+        with self._lock:
+            added = {chunk_id: dict(Counter(tokenize(text))) for chunk_id, text in items}
+            if added:
+                entry = {"add": added}
+                self._apply(entry)
+                self._pending.append(entry)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        with self._lock:
+            # Kept even if unknown here: another process may have indexed them
+            removed = list(chunk_ids)
+            if removed:
+                entry = {"remove": removed}
+                self._apply(entry)
+                self._pending.append(entry)
+
+    def clear(self):
+        with self._lock:
+            entry = {"clear": True}
+            self._apply(entry)
+            # Nothing written before a clear matters any more
+            self._pending = [entry]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, score) pairs, best first."""
+        with self._lock:
+            self._catch_up()
+            doc_count = len(self._doc_terms)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self):
+        """Append the changes since the last save to the log, snapshotting once the log outgrows the snapshot."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                self._catch_up()
+                with open(self.log_path, "ab") as f:
+                    f.write(b"".join(
+                        json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                        for entry in self._pending
+                    ))
+                self._pending = []
+                self._log_offset = self._log_size()
+                snapshot_size = os.path.getsize(self.path) if self._snapshot_stamp is not None else 0
+                if self._log_offset > max(snapshot_size, self.min_snapshot_log_bytes):
+                    self._write_snapshot()
+
+    def snapshot(self):
+        """Write everything to the snapshot and empty the log, e.g. on shutdown."""
+        with self._lock:
+            with self._file_lock():
+                self._catch_up()
+                if self._pending or self._log_size() or self._snapshot_stamp is None:
+                    self._write_snapshot()
+
+    def _write_snapshot(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._doc_terms, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        # The snapshot covers the log (and local pending changes), so both start over
+        open(self.log_path, "wb").close()
+        self._pending = []
+        self._log_offset = 0
+        self._snapshot_stamp = self._stat_snapshot()
+        logger.debug(f"Saved BM25 snapshot with {len(self._doc_terms)} chunks")
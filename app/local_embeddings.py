@@ -0,0 +1,137 @@
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers model run in-process on the CPU.
+
+    The model is loaded once and driven by a single inference thread, with torch
+    using `threads` cores for each forward pass. Query embeddings requested
+    concurrently (e.g. by different chat requests) are merged into one forward
+    pass; the thread waits up to `max_wait_ms` for more queries to arrive before
+    running a partial batch. Queries are served ahead of queued document batches
+    so ingestion does not stall chat traffic.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, threads: int = 0, max_wait_ms: float = 5.0):
+        # Imported lazily: torch is slow to import and only needed for this backend
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count() or 1
+        self.max_wait_seconds = max_wait_ms / 1000
+        torch.set_num_threads(self.threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+        self._queries: Deque[Tuple[str, Future]] = deque()
+        self._documents: Deque[Tuple[List[str], Future]] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="local-embeddings", daemon=True)
+        self._thread.start()
+        logger.info(f"Loaded local embedding model {model_name} ({self.threads} threads)")
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def _next_query_batch(self) -> List[Tuple[str, Future]]:
+        """Take queued queries, lingering briefly so concurrent callers share the pass."""
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(self._queries) < self.batch_size and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+        count = min(len(self._queries), self.batch_size)
+        return [self._queries.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queries and not self._documents and not self._closed:
+                    self._condition.wait()
+                if self._queries:
+                    queries = self._next_query_batch()
+                    documents = None
+                elif self._documents:
+                    queries = None
+                    documents = self._documents.popleft()
+                else:
+                    return
+
+            if queries:
+                try:
+                    vectors = self._encode([text for text, _ in queries])
+                except Exception as e:
+                    for _, future in queries:
+                        future.set_exception(e)
+                else:
+                    for (_, future), vector in zip(queries, vectors):
+                        future.set_result(vector)
+                logger.debug(f"Embedded {len(queries)} queries in one pass")
+            elif documents:
+                texts, future = documents
+                try:
+                    future.set_result(self._encode(texts))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def _submit_query(self, text: str) -> Future:
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Local embeddings have been closed")
+            self._queries.append((text, future))
+            self._condition.notify()
+        return future
+
+    def _submit_documents(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Local embeddings have been closed")
+            self._documents.append((list(texts), future))
+            self._condition.notify()
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._submit_documents(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit_query(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return await asyncio.wrap_future(self._submit_documents(texts))
+
+    def close(self, timeout: Optional[float] = None):
+        """Finish queued work and stop the inference thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,275 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Id of the request being handled, included in every log line through TraceIdFilter
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], Optional[float]]] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], Optional[float]], **labels: str):
+        """Compute the value when metrics are scraped; None leaves the sample out."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for key, function in functions:
+            value = function()
+            if value is not None:
+                items.append((key, value))
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last)], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + [float("inf")], counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_http_requests_total", "HTTP requests handled.", ["method", "path", "status"]))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_http_request_duration_seconds", "HTTP request latency, until the response body is sent.", ["method", "path"]))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "chatbot_http_requests_in_flight", "HTTP requests currently being handled."))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_stage_duration_seconds", "Time spent in each stage of request handling.", ["stage"]))
+LLM_CALLS = REGISTRY.register(Counter(
+    "chatbot_llm_calls_total", "Chat completion calls.", ["model"]))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "chatbot_llm_calls_in_flight", "Chat completion calls currently running (excluding those waiting for a slot)."))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "chatbot_llm_tokens_total", "Chat completion tokens.", ["model", "kind"]))
+EMBEDDING_TEXTS = REGISTRY.register(Counter(
+    "chatbot_embedding_texts_total", "Texts embedded, by where the vector came from.", ["kind", "source"]))
+EMBEDDING_TOKENS = REGISTRY.register(Counter(
+    "chatbot_embedding_tokens_total", "Tokens sent to the embedding model.", ["model"]))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "chatbot_tool_calls_total", "Tool invocations by the agent or the query router.", ["tool"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_cache_requests_total", "Cache lookups.", ["cache", "result"]))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "chatbot_cache_hit_ratio", "Fraction of lookups that hit, since startup.", ["cache"]))
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _hit_ratio(cache: str) -> Optional[float]:
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+    return hits / total if total else None
+
+
+for _cache in ("answer", "embedding", "brave"):
+    CACHE_HIT_RATIO.set_function(lambda cache=_cache: _hit_ratio(cache), cache=_cache)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"stage {name} took {elapsed * 1000:.1f} ms")
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current request's trace id to log records as `trace_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that assigns each request a trace id and records HTTP metrics.
+
+    The trace id is taken from an incoming `X-Request-ID` header when present,
+    returned as `X-Trace-ID`, and available to logs through `TraceIdFilter`.
+    Latency is measured until the last body chunk is sent, so streamed
+    responses are counted in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                trace_id = value.decode("latin-1")[:64]
+                break
+        trace_id = trace_id or uuid.uuid4().hex[:16]
+        token = trace_id_var.set(trace_id)
+        status = "500"
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template, not the raw path, to keep cardinality bounded
+            path = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method=scope["method"], path=path, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], path=path)
+            trace_id_var.reset(token)
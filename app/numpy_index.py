@@ -0,0 +1,505 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import glob
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float32", "int8")
+MANIFEST = "manifest.json"
+# Rows copied at a time during compaction
+COMPACT_BLOCK_ROWS = 65536
+# Compaction never runs on collections with fewer dead rows than this
+MIN_COMPACT_ROWS = 1024
+
+_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+}
+
+
+def matches(metadata: Optional[dict], where: Optional[dict]) -> bool:
+    """Evaluate a Chroma-style `where` filter ($and, $or and field operators) against one metadata dict."""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, target in condition.items():
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported where operator {operator!r}")
+                if not _OPERATORS[operator](metadata.get(key), target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def quantize(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization: returns (codes, scales) with vectors ~= codes * scales."""
+    peaks = np.abs(vectors).max(axis=1)
+    scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class NumpyCollection:
+    """Exact vector search over a memory-mapped matrix, with the subset of Chroma's collection API the app uses.
+
+    Vectors are L2-normalized on write and stored row by row in one contiguous
+    file, either as float32 or as int8 codes with a float32 scale per row. A
+    JSONL sidecar holds each row's id, metadata and document. Both files are
+    only ever appended to; a replaced or deleted row is recorded in a
+    tombstone file and skipped until compaction rewrites the live rows into a
+    new generation of files.
+
+    Queries score every live row that passes the `where` filter with one
+    matrix-vector product and pick the top k with argpartition. Distances are
+    cosine distances (1 - cosine similarity). The matrix is opened with
+    np.memmap, so worker processes serving the same directory share its pages
+    through the OS page cache. Each process notices other processes' writes
+    by checking the file sizes before every operation. Writers serialize on
+    an flock'd lock file.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str = "float32", compact_ratio: float = 0.25):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {dtype!r}, expected one of {DTYPES}")
+        self.name = name
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock():
+            if not os.path.exists(self._path(MANIFEST)):
+                self._write_manifest({"generation": 0, "dtype": dtype, "dimension": None, "metadata": {}})
+        self._reset()
+        self._refresh()
+        if self._manifest["dtype"] != dtype:
+            logger.warning(
+                f"Vector index {name} is stored as {self._manifest['dtype']}; ignoring the configured {dtype} "
+                f"until it is rebuilt"
+            )
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _generation_path(self, kind: str, generation: Optional[int] = None) -> str:
+        generation = self._manifest["generation"] if generation is None else generation
+        extension = {"vectors": "bin", "scales": "bin", "rows": "jsonl", "tombstones": "txt"}[kind]
+        return self._path(f"{kind}-{generation}.{extension}")
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp_path = self._path(MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(MANIFEST))
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Exclusive across threads and, where flock is available, across processes."""
+        with self._lock, open(self._path(".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self):
+        self._manifest: Dict[str, Any] = {}
+        self._ids: List[str] = []
+        self._metadatas: List[dict] = []
+        self._offsets: List[int] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._dead = 0
+        self._rows_read_bytes = 0
+        self._tombstones_read_bytes = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    @property
+    def _dimension(self) -> Optional[int]:
+        return self._manifest.get("dimension")
+
+    @property
+    def _itemsize(self) -> int:
+        return np.dtype(self._manifest["dtype"]).itemsize
+
+    def _refresh(self):
+        """Catch up with rows, tombstones and compactions written since the last call, by this or another process."""
+        with open(self._path(MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("generation") != self._manifest.get("generation"):
+            self._reset()
+        self._manifest = manifest
+        if self._dimension is None:
+            return
+
+        if self._file_size("rows") > self._rows_read_bytes:
+            self._read_rows(self._generation_path("rows"))
+        if self._file_size("tombstones") > self._tombstones_read_bytes:
+            self._read_tombstones(self._generation_path("tombstones"))
+
+    def _file_size(self, kind: str) -> int:
+        try:
+            return os.path.getsize(self._generation_path(kind))
+        except FileNotFoundError:
+            return 0
+
+    def _read_rows(self, rows_path: str):
+        vector_rows = self._file_size("vectors") // (self._dimension * self._itemsize)
+        if self._manifest["dtype"] == "int8":
+            vector_rows = min(vector_rows, self._file_size("scales") // 4)
+        added = 0
+        with open(rows_path, "rb") as f:
+            f.seek(self._rows_read_bytes)
+            offset = self._rows_read_bytes
+            for line in f:
+                # Stop at a torn last line or at rows whose vectors are not fully written yet
+                if not line.endswith(b"\n") or len(self._ids) >= vector_rows:
+                    break
+                record = json.loads(line)
+                # A replaced row stays live until its tombstone, written before the new row, is read
+                self._row_by_id[record["id"]] = len(self._ids)
+                self._ids.append(record["id"])
+                self._metadatas.append(record.get("metadata") or {})
+                self._offsets.append(offset)
+                offset += len(line)
+                added += 1
+        self._rows_read_bytes = offset
+        if added:
+            self._live = np.concatenate([self._live, np.ones(added, dtype=bool)])
+            self._map(len(self._ids))
+
+    def _read_tombstones(self, tombstones_path: str):
+        with open(tombstones_path, "rb") as f:
+            f.seek(self._tombstones_read_bytes)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        self._tombstones_read_bytes += len(complete)
+        for line in complete.split():
+            row = int(line)
+            if row < len(self._live) and self._live[row]:
+                self._live[row] = False
+                self._dead += 1
+                if self._row_by_id.get(self._ids[row]) == row:
+                    del self._row_by_id[self._ids[row]]
+
+    def _map(self, rows: int):
+        shape = (rows, self._dimension)
+        self._matrix = np.memmap(self._generation_path("vectors"), dtype=self._manifest["dtype"], mode="r", shape=shape)
+        if self._manifest["dtype"] == "int8":
+            self._scales = np.memmap(self._generation_path("scales"), dtype=np.float32, mode="r", shape=(rows,))
+
+    def _vectors(self, rows: Sequence[int]) -> np.ndarray:
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def _documents(self, rows: Sequence[int]) -> List[str]:
+        documents = []
+        if not rows:
+            return documents
+        with open(self._generation_path("rows"), "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                documents.append(json.loads(f.readline()).get("document"))
+        return documents
+
+    def _result(self, rows: Sequence[int], include: Sequence[str]) -> Dict[str, Any]:
+        rows = list(rows)
+        embeddings = None
+        if "embeddings" in include:
+            embeddings = self._vectors(rows) if rows else np.zeros((0, self._dimension or 0), dtype=np.float32)
+        return {
+            "ids": [self._ids[row] for row in rows],
+            "documents": self._documents(rows) if "documents" in include else None,
+            "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": embeddings,
+            "include": list(include),
+        }
+
+    # Chroma collection API
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return dict(self._manifest.get("metadata") or {})
+
+    def modify(self, metadata: Optional[Dict[str, Any]] = None):
+        with self._write_lock():
+            self._refresh()
+            if metadata is not None:
+                self._manifest["metadata"] = dict(metadata)
+                self._write_manifest(self._manifest)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids) - self._dead
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                rows = [self._row_by_id[i] for i in dict.fromkeys(ids) if i in self._row_by_id]
+            else:
+                rows = np.flatnonzero(self._live).tolist()
+            if where:
+                rows = [row for row in rows if matches(self._metadatas[row], where)]
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            return self._result(rows, include)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            candidates = self._live.copy()
+            if where:
+                # Pre-filter on metadata so the top k is taken among matching rows only
+                for row in np.flatnonzero(candidates):
+                    candidates[row] = matches(self._metadatas[row], where)
+            results = {key: [] for key in ("ids", "documents", "metadatas", "embeddings", "distances")}
+            for query in query_embeddings:
+                rows, similarities = self._top_k(np.asarray(query, dtype=np.float32), candidates, n_results)
+                result = self._result(rows, include)
+                for key in ("ids", "documents", "metadatas", "embeddings"):
+                    results[key].append(result[key])
+                results["distances"].append((1.0 - similarities).tolist())
+            for key in ("documents", "metadatas", "embeddings", "distances"):
+                if key not in include:
+                    results[key] = None
+            results["include"] = list(include)
+            return results
+
+    def _top_k(self, query: np.ndarray, candidates: np.ndarray, k: int):
+        k = min(k, int(candidates.sum()))
+        if self._matrix is None or k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        if self._scales is None:
+            scores = self._matrix @ query
+        else:
+            # einsum widens the int8 codes on the fly instead of materializing a float32 copy of the matrix
+            scores = np.einsum("ij,j->i", self._matrix, query, dtype=np.float32, casting="unsafe") * self._scales
+        scores = np.where(candidates, scores, -np.inf)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top.tolist(), scores[top]
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+    ):
+        if not ids:
+            return
+        # Like a sequence of upserts, the last row for a repeated id wins
+        last = list({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+        if len(last) < len(ids):
+            ids = [ids[i] for i in last]
+            embeddings = [embeddings[i] for i in last]
+            documents = [documents[i] for i in last] if documents else None
+            metadatas = [metadatas[i] for i in last] if metadatas else None
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+
+        with self._write_lock():
+            self._refresh()
+            if self._dimension is None:
+                self._manifest["dimension"] = int(vectors.shape[1])
+                self._write_manifest(self._manifest)
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self._dimension}")
+            self._truncate_torn_tail()
+
+            replaced = [self._row_by_id[i] for i in ids if i in self._row_by_id]
+            if replaced:
+                self._append_tombstones(replaced)
+            with open(self._generation_path("rows"), "ab") as f:
+                f.write(b"".join(
+                    json.dumps({"id": i, "metadata": m, "document": d}, ensure_ascii=False).encode("utf-8") + b"\n"
+                    for i, d, m in zip(ids, documents, metadatas)
+                ))
+                f.flush()
+                os.fsync(f.fileno())
+            if self._manifest["dtype"] == "int8":
+                codes, scales = quantize(vectors)
+                self._append_bytes("scales", scales.tobytes())
+                self._append_bytes("vectors", codes.tobytes())
+            else:
+                self._append_bytes("vectors", vectors.tobytes())
+            self._refresh()
+            self._maybe_compact()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        with self._write_lock():
+            self._refresh()
+            rows = [self._row_by_id[i] for i in ids if i in self._row_by_id] if ids is not None else np.flatnonzero(self._live).tolist()
+            if where:
+                rows = [row for row in rows if matches(self._metadatas[row], where)]
+            if rows:
+                self._append_tombstones(rows)
+                self._refresh()
+                self._maybe_compact()
+
+    def _append_bytes(self, kind: str, data: bytes):
+        with open(self._generation_path(kind), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_tombstones(self, rows: Sequence[int]):
+        self._append_bytes("tombstones", "".join(f"{row}\n" for row in rows).encode("ascii"))
+
+    def _truncate_torn_tail(self):
+        """Drop bytes left behind by a writer that crashed mid-append, so new rows line up again."""
+        rows = len(self._ids)
+        expected = {
+            "rows": self._rows_read_bytes,
+            "tombstones": self._tombstones_read_bytes,
+            "vectors": rows * self._dimension * self._itemsize
+        }
+        if self._manifest["dtype"] == "int8":
+            expected["scales"] = rows * 4
+        for kind, size in expected.items():
+            path = self._generation_path(kind)
+            if self._file_size(kind) > size:
+                logger.warning(f"Truncating incomplete write at the end of {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        if self._matrix is not None:
+            self._map(rows)
+
+    # Compaction
+
+    def _maybe_compact(self):
+        if self._dead >= MIN_COMPACT_ROWS and self._dead > self.compact_ratio * len(self._ids):
+            self._compact()
+
+    def compact(self):
+        """Rewrite the live rows into a new generation of files, dropping deleted and replaced rows."""
+        with self._write_lock():
+            self._refresh()
+            self._compact()
+
+    def _compact(self):
+        old_generation = self._manifest["generation"]
+        generation = old_generation + 1
+        live = np.flatnonzero(self._live)
+        documents = self._documents(live.tolist())
+        with open(self._generation_path("rows", generation), "wb") as f:
+            for row, document in zip(live.tolist(), documents):
+                f.write(json.dumps(
+                    {"id": self._ids[row], "metadata": self._metadatas[row], "document": document}, ensure_ascii=False
+                ).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._generation_path("vectors", generation), "wb") as f:
+            for start in range(0, len(live), COMPACT_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(self._matrix[live[start:start + COMPACT_BLOCK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        if self._scales is not None:
+            with open(self._generation_path("scales", generation), "wb") as f:
+                f.write(np.ascontiguousarray(self._scales[live]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._write_manifest({**self._manifest, "generation": generation})
+        logger.info(f"Compacted vector index {self.name}: kept {len(live)} of {len(self._ids)} rows")
+        self._remove_generations_before(old_generation)
+        self._refresh()
+
+    def _remove_generations_before(self, generation: int):
+        # The newest old generation is kept for readers that have not switched yet
+        for path in glob.glob(self._path("*-*.*")):
+            try:
+                if int(os.path.basename(path).split("-")[1].split(".")[0]) < generation:
+                    os.remove(path)
+            except (ValueError, IndexError, FileNotFoundError):
+                pass
+
+    def drop(self):
+        """Empty the collection by switching to a new, empty generation; other processes follow on their next call."""
+        with self._write_lock():
+            self._refresh()
+            old_generation = self._manifest["generation"]
+            self._write_manifest({
+                "generation": old_generation + 1,
+                "dtype": self._manifest["dtype"],
+                "dimension": None,
+                "metadata": {}
+            })
+            self._remove_generations_before(old_generation)
+            self._refresh()
+
+
+def migrate_from_chroma(source, target: NumpyCollection, batch_size: int = 500) -> int:
+    """Copy every row and the metadata of a Chroma collection into a NumpyCollection. Returns the rows copied."""
+    copied = 0
+    offset = 0
+    while True:
+        page = source.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if not page["ids"]:
+            break
+        target.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        copied += len(page["ids"])
+        offset += len(page["ids"])
+    metadata = {key: value for key, value in (source.metadata or {}).items() if not key.startswith("hnsw:")}
+    target.modify(metadata=metadata)
+    return copied
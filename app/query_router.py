@@ -0,0 +1,103 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+import re
+import threading
+
+import numpy as np
+
+SMALLTALK = "smalltalk"
+DOCUMENTS = "documents"
+WEB = "web"
+HYBRID = "hybrid"
+AGENT = "agent"
+ROUTES = (SMALLTALK, DOCUMENTS, WEB, HYBRID, AGENT)
+
+SMALLTALK_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|yo|hiya|greetings|good (morning|afternoon|evening)|thanks|thank you|thx|"
+    r"ok(ay)?|cool|great|bye|goodbye|see you|how are you|how's it going|who are you|what can you do)"
+    r"([\s,]+(there|all|everyone|bot|again|so much|a lot|doing|today))*[\s!?.]*$",
+    re.IGNORECASE
+)
+WEB_PATTERN = re.compile(
+    r"\b(latest|today|tonight|yesterday|tomorrow|this (week|month|year)|current(ly)?|right now|news|"
+    r"weather|stock|price|score|released?|search (the )?(web|internet|online)|google|look up)\b",
+    re.IGNORECASE
+)
+DOCUMENT_PATTERN = re.compile(
+    r"\b(document|documents|doc|docs|file|files|pdf|upload(ed)?|according to|in the (text|report|paper|manual))\b",
+    re.IGNORECASE
+)
+
+
+class QueryRouter:
+    """Picks how a question is answered without calling the LLM.
+
+    Small talk is answered directly, questions that match uploaded documents go
+    to a single retrieve-then-answer call, questions about current events go to
+    web search, and questions with both signals get retrieval and web search run
+    concurrently. Anything unclear falls back to the ReAct agent.
+
+    `lexical_search` is the BM25 index lookup, so a document match costs no
+    embedding call.
+    """
+
+    def __init__(
+        self,
+        lexical_search: Callable[[str, int], List[Tuple[str, float]]],
+        document_min_score: float = 5.0,
+        smalltalk_max_words: int = 8
+    ):
+        self.lexical_search = lexical_search
+        self.document_min_score = document_min_score
+        self.smalltalk_max_words = smalltalk_max_words
+
+    def route(self, question: str) -> str:
+        if len(question.split()) <= self.smalltalk_max_words and SMALLTALK_PATTERN.match(question):
+            return SMALLTALK
+
+        lexical = self.lexical_search(question, 1)
+        wants_documents = bool(DOCUMENT_PATTERN.search(question)) or (
+            bool(lexical) and lexical[0][1] >= self.document_min_score
+        )
+        wants_web = bool(WEB_PATTERN.search(question))
+
+        if wants_documents and wants_web:
+            return HYBRID
+        if wants_documents:
+            return DOCUMENTS
+        if wants_web:
+            return WEB
+        return AGENT
+
+
+class RouteLatencyStats:
+    """Keeps the most recent latencies per route and reports percentiles."""
+
+    def __init__(self, window: int = 1024):
+        self._samples: Dict[str, Deque[float]] = {route: deque(maxlen=window) for route in ROUTES}
+        self._counts: Dict[str, int] = {route: 0 for route in ROUTES}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float):
+        with self._lock:
+            self._samples[route].append(seconds)
+            self._counts[route] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {route: list(values) for route, values in self._samples.items()}
+            counts = dict(self._counts)
+        stats = {}
+        for route, values in samples.items():
+            if not values:
+                stats[route] = {"count": counts[route]}
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            stats[route] = {
+                "count": counts[route],
+                "p50_ms": round(float(p50), 1),
+                "p95_ms": round(float(p95), 1),
+                "p99_ms": round(float(p99), 1),
+                "mean_ms": round(sum(values) / len(values) * 1000, 1)
+            }
+        return stats
@@ -4,37 +4,122 @@ from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from app.config import get_settings
+from app.errors import QueryTimeoutError
 from app.vector_store import VectorStore
-from app.tools.web_search import get_brave_search_tool
+from app.hybrid_retriever import HybridRetriever, VectorRetriever
+from app.tools.web_search import get_brave_search_tool, brave_search_tool_func, abrave_search_tool_func
 from langchain.tools import Tool
 from langchain.agents import initialize_agent, AgentType
+from app.streaming import AgentStreamHandler, StreamEvent
+from app.answer_cache import AnswerCache, SingleFlight
+from app.conversation import ConversationContext, select_context
+from app.metrics import LLM_CALLS, LLM_IN_FLIGHT, LLM_TOKENS, TOOL_CALLS, record_cache, stage
+from app.query_router import AGENT, DOCUMENTS, HYBRID, SMALLTALK, WEB, QueryRouter, RouteLatencyStats
+import asyncio
 import logging
-from typing import Optional, List
+import threading
+import time
+from typing import AsyncIterator, Optional, List, Union
 from pydantic import BaseModel
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-def get_retriever_tool(retriever):
+# Process-wide caps on concurrent completions, shared by every request
+_llm_sync_limit = threading.BoundedSemaphore(settings.max_concurrent_llm_calls)
+_llm_async_limit = asyncio.Semaphore(settings.max_concurrent_llm_calls)
+
+def _record_llm_usage(model: str, result):
+    LLM_CALLS.inc(model=model)
+    for generations in result.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+                LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+
+async def _timed(name: str, awaitable):
+    with stage(name):
+        return await awaitable
+
+class ThrottledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that waits for a free slot before each completion, and records its latency and token usage."""
+
+    def generate(self, *args, **kwargs):
+        with stage("llm_queue_wait"):
+            _llm_sync_limit.acquire()
+        try:
+            with LLM_IN_FLIGHT.track_inprogress(), stage("llm"):
+                result = super().generate(*args, **kwargs)
+        finally:
+            _llm_sync_limit.release()
+        _record_llm_usage(self.model_name, result)
+        return result
+
+    async def agenerate(self, *args, **kwargs):
+        with stage("llm_queue_wait"):
+            await _llm_async_limit.acquire()
+        try:
+            with LLM_IN_FLIGHT.track_inprogress(), stage("llm"):
+                result = await super().agenerate(*args, **kwargs)
+        finally:
+            _llm_async_limit.release()
+        _record_llm_usage(self.model_name, result)
+        return result
+
+def _format_documents(docs):
+    results = []
+    for doc in docs:
+        # doc.metadata might include 'filename'
+        results.append({
+            "content": doc.page_content,
+            "metadata": doc.metadata
+        })
+    return results
+
+def get_retriever_tool(retriever, select=None):
+    select = select or (lambda docs: docs)
+
     def retrieve_with_metadata(q):
-        docs = retriever.get_relevant_documents(q)
-        results = []
-        for doc in docs:
-            # doc.metadata might include 'filename'
-            results.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata
-            })
-        return results
+        TOOL_CALLS.inc(tool="document_retriever")
+        with stage("retrieval"):
+            return _format_documents(select(retriever.invoke(q)))
+
+    async def aretrieve_with_metadata(q):
+        TOOL_CALLS.inc(tool="document_retriever")
+        with stage("retrieval"):
+            return _format_documents(select(await retriever.ainvoke(q)))
+
     return Tool(
         name="Document Retriever",
         func=retrieve_with_metadata,
+        coroutine=aretrieve_with_metadata,
         description="Useful for answering questions based on uploaded documents and internal knowledge. Input should be a question."
     )
 
+SMALLTALK_PROMPT = "You are a friendly assistant. Reply briefly and conversationally.\n\n{history}User: {question}\nAssistant:"
+
+SUMMARY_PROMPT = (
+    "Progressively summarize the conversation, adding the new lines to the previous summary. "
+    "Keep names, numbers and open questions; use at most 150 words.\n\n"
+    "Previous summary:\n{summary}\n\nNew lines:\n{lines}\n\nNew summary:"
+)
+
+def _history_section(history: str) -> str:
+    return f"Conversation so far:\n{history}\n\n" if history else ""
+
+def build_context_prompt(question: str, docs=None, web_results: Optional[str] = None, history: str = "") -> str:
+    """Prompt for a single answer call over retrieved chunks and/or web results."""
+    sections = []
+    if docs:
+        sections.append("Context:\n" + "\n".join(doc.page_content for doc in docs))
+    if web_results:
+        sections.append(web_results)
+    if not sections:
+        sections.append("Context:\n(no relevant documents found)")
+    return _history_section(history) + "\n\n".join(sections) + f"\n\nQuestion: {question}\nAnswer:"
+
 class ChatResponse(BaseModel):
     response: str
     document_names: Optional[List[str]] = None
@@ -42,14 +127,26 @@ class ChatResponse(BaseModel):
 class RAGChain:
     def __init__(self):
         self.vector_store = VectorStore()
-        self.llm = ChatOpenAI(
+        self.llm = ThrottledChatOpenAI(
             model_name=settings.model_name,
             temperature=0.7,
-            openai_api_key=settings.openai_api_key
+            openai_api_key=settings.openai_api_key,
+            streaming=True,
+            # Report token usage on streamed completions too
+            stream_usage=True
         )
-        self.retriever = self.vector_store.vector_store.as_retriever()
+        # Fetch extra candidates; select_context trims them to the context budget
+        if settings.hybrid_retrieval_enabled:
+            self.retriever = HybridRetriever(
+                vector_store=self.vector_store,
+                k=settings.retrieval_candidates,
+                lexical_min_score=settings.hybrid_lexical_min_score,
+                lexical_margin=settings.hybrid_lexical_margin
+            )
+        else:
+            self.retriever = VectorRetriever(vector_store=self.vector_store, k=settings.retrieval_candidates)
         self.tools = [
-            get_retriever_tool(self.retriever),
+            get_retriever_tool(self.retriever, select=self.select_context),
             get_brave_search_tool()
         ]
         self.agent = initialize_agent(
@@ -58,27 +155,235 @@ class RAGChain:
             agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
             verbose=False
         )
+        self.answer_cache = AnswerCache(
+            max_entries=settings.answer_cache_max_entries,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            similarity_threshold=settings.answer_cache_similarity_threshold,
+            shared_generation=self.vector_store.generation
+        )
+        self._inflight = SingleFlight()
+        self.router = QueryRouter(
+            self.vector_store.lexical_search,
+            document_min_score=settings.router_document_min_score
+        )
+        self.route_stats = RouteLatencyStats()
+        # Stored answers may depend on documents that just changed
+        self.vector_store.add_change_listener(self.answer_cache.invalidate)
 
     def query(self, question: str) -> str:
-        """Query the agent with a question. The agent decides which tool(s) to use."""
-        result = self.agent.run(question)
+        """Answer a question, routing it straight to the tools it needs or to the agent."""
+        if not settings.answer_cache_enabled:
+            return self._run(question)
+
+        cached = self.answer_cache.get(question)
+        if cached is None:
+            generation = self.answer_cache.generation
+            vector = self._embed_question(question)
+            if vector is not None:
+                cached = self.answer_cache.get_similar(vector)
+        record_cache("answer", cached is not None)
+        if cached is not None:
+            return cached
+
+        result = self._run(question)
+        self.answer_cache.put(question, vector, result, generation)
+        return result
+
+    def select_context(self, docs):
+        """Deduplicate retrieved chunks and trim them to the context token budget with MMR."""
+        return select_context(
+            docs,
+            token_budget=settings.context_token_budget,
+            model_name=settings.model_name,
+            lambda_mult=settings.context_mmr_lambda
+        )
+
+    async def asummarize(self, summary: str, new_lines: str) -> str:
+        """Fold new conversation lines into a rolling summary."""
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", lines=new_lines)
+        message = await self.llm.ainvoke(prompt)
+        return message.content.strip()
+
+    async def aquery(self, question: str, context: Optional[ConversationContext] = None) -> str:
+        """Async version of query, bounded by the configured request timeout.
+
+        `context` carries earlier turns of the conversation. Answers that depend
+        on it are not cached. Identical questions that arrive while one is
+        already running share that single agent execution.
+        """
+        if not settings.answer_cache_enabled or (context and context.history):
+            return await self._arun_agent(question, context=context)
+
+        cached = self.answer_cache.get(question)
+        if cached is not None:
+            record_cache("answer", True)
+            return cached
+        return await self._inflight.do(
+            AnswerCache.normalize(question),
+            lambda: self._aquery_cached(question)
+        )
+
+    async def _aquery_cached(self, question: str) -> str:
+        generation = self.answer_cache.generation
+        vector = await self._aembed_question(question)
+        cached = self.answer_cache.get_similar(vector) if vector is not None else None
+        record_cache("answer", cached is not None)
+        if cached is not None:
+            return cached
+
+        result = await self._arun_agent(question)
+        self.answer_cache.put(question, vector, result, generation)
         return result
 
+    def route(self, question: str) -> str:
+        if not settings.query_router_enabled:
+            return AGENT
+        with stage("route"):
+            return self.router.route(question)
+
+    def _run(self, question: str) -> str:
+        route = self.route(question)
+        start = time.perf_counter()
+        try:
+            if route == AGENT:
+                with stage("agent"):
+                    return self.agent.run(question)
+            if route == SMALLTALK:
+                return self.llm.invoke(SMALLTALK_PROMPT.format(history="", question=question)).content
+            docs = None
+            if route in (DOCUMENTS, HYBRID):
+                TOOL_CALLS.inc(tool="document_retriever")
+                with stage("retrieval"):
+                    docs = self.select_context(self.retriever.invoke(question))
+            web_results = brave_search_tool_func(question) if route in (WEB, HYBRID) else None
+            return self.llm.invoke(build_context_prompt(question, docs, web_results)).content
+        finally:
+            self.route_stats.record(route, time.perf_counter() - start)
+
+    async def _arun_routed(self, question: str, route: str, context: Optional[ConversationContext] = None, callbacks=None) -> str:
+        """Answer with at most one LLM call, fetching documents and web results concurrently."""
+        config = {"callbacks": callbacks} if callbacks else None
+        history = context.history if context else ""
+        for handler in callbacks or []:
+            if isinstance(handler, AgentStreamHandler):
+                handler.passthrough = True
+        if route == SMALLTALK:
+            prompt = SMALLTALK_PROMPT.format(history=_history_section(history), question=question)
+        else:
+            # Follow-ups like "which one?" retrieve better with the previous question attached
+            search_query = question
+            if context and context.last_user_message:
+                search_query = f"{context.last_user_message} {question}"
+
+            async def no_results():
+                return None
+            if route in (DOCUMENTS, HYBRID):
+                TOOL_CALLS.inc(tool="document_retriever")
+            docs, web_results = await asyncio.gather(
+                _timed("retrieval", self.retriever.ainvoke(search_query)) if route in (DOCUMENTS, HYBRID) else no_results(),
+                abrave_search_tool_func(search_query) if route in (WEB, HYBRID) else no_results()
+            )
+            prompt = build_context_prompt(question, self.select_context(docs or []), web_results, history)
+        message = await self.llm.ainvoke(prompt, config=config)
+        return message.content
+
+    async def _arun_agent(self, question: str, context: Optional[ConversationContext] = None, callbacks=None) -> str:
+        route = self.route(question)
+        if route == AGENT:
+            agent_input = question
+            if context and context.history:
+                agent_input = f"{_history_section(context.history)}Question: {question}"
+            work = _timed("agent", self.agent.arun(agent_input, callbacks=callbacks))
+        else:
+            work = self._arun_routed(question, route, context=context, callbacks=callbacks)
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(work, timeout=settings.request_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise QueryTimeoutError(
+                f"Query did not finish within {settings.request_timeout_seconds} seconds"
+            )
+        finally:
+            self.route_stats.record(route, time.perf_counter() - start)
+
+    def _embed_question(self, question: str):
+        try:
+            with stage("embed_question"):
+                return self.vector_store.embeddings.embed_query(question)
+        except Exception as e:
+            logger.warning(f"Could not embed question for answer cache lookup: {str(e)}")
+            return None
+
+    async def _aembed_question(self, question: str):
+        try:
+            with stage("embed_question"):
+                return await self.vector_store.embeddings.aembed_query(question)
+        except Exception as e:
+            logger.warning(f"Could not embed question for answer cache lookup: {str(e)}")
+            return None
+
+    async def astream(self, question: str, context: Optional[ConversationContext] = None) -> AsyncIterator[StreamEvent]:
+        """Run the agent and yield (event, data) pairs while it works.
+
+        Yields "step" and "observation" events for tool use, "token" events for
+        the final answer as it is generated, and a closing "answer" event with
+        the full response.
+        """
+        use_cache = settings.answer_cache_enabled and not (context and context.history)
+        if use_cache:
+            cached = self.answer_cache.get(question)
+            if cached is None:
+                generation = self.answer_cache.generation
+                vector = await self._aembed_question(question)
+                if vector is not None:
+                    cached = self.answer_cache.get_similar(vector)
+            record_cache("answer", cached is not None)
+            if cached is not None:
+                yield "token", {"token": cached}
+                yield "answer", {"response": cached}
+                return
+
+        handler = AgentStreamHandler()
+        task = asyncio.create_task(self._arun_agent(question, context=context, callbacks=[handler]))
+        task.add_done_callback(lambda _: handler.queue.put_nowait(None))
+        try:
+            while (event := await handler.queue.get()) is not None:
+                yield event
+            result = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+        if use_cache:
+            self.answer_cache.put(question, vector, result, generation)
+        yield "answer", {"response": result}
+
     def query_with_metadata(self, question: str):
-        docs = self.retriever.get_relevant_documents(question)
-        context = "\n".join([doc.page_content for doc in docs])
-        prompt = f"Context:\n{context}\n\nQuestion: {question}\nAnswer:"
-        answer = self.llm(prompt)
+        docs = self.select_context(self.retriever.invoke(question))
+        answer = self.llm.invoke(build_context_prompt(question, docs)).content
         doc_names = [doc.metadata.get("filename") for doc in docs if "filename" in doc.metadata]
         return {"response": answer, "document_names": doc_names}
 
-    def add_documents(self, text: str, metadata: dict = None):
-        """Add a document to the vector store."""
+    async def aquery_with_metadata(self, question: str):
+        """Async query_with_metadata; the completion waits for a slot like every other async LLM call."""
+        docs = self.select_context(await self.retriever.ainvoke(question))
+        message = await self.llm.ainvoke(build_context_prompt(question, docs))
+        doc_names = [doc.metadata.get("filename") for doc in docs if "filename" in doc.metadata]
+        return {"response": message.content, "document_names": doc_names}
+
+    def add_documents(
+        self,
+        text: Union[str, List[str]],
+        metadata: Optional[Union[dict, List[dict]]] = None,
+        wait: bool = True,
+        update: bool = False
+    ):
+        """Add a document, or several texts such as the pages of a PDF with per-page metadata, to the vector store."""
         logger.debug(f"Adding document with metadata: {metadata}")
-        logger.debug(f"Text type: {type(text)}")
-        logger.debug(f"Text length: {len(text) if isinstance(text, str) else 'N/A'}")
-        # Ensure text is a string
-        if not isinstance(text, str):
-            raise ValueError(f"Expected string, got {type(text)}")
-        # Add to vector store
-        self.vector_store.add_documents(text, metadata) 
\ No newline at end of file
+        if not isinstance(text, (str, list)):
+            raise ValueError(f"Expected a string or a list of strings, got {type(text)}")
+        return self.vector_store.add_documents(text, metadata, wait=wait, update=update)
+
+    async def aadd_text_stream(self, text_stream, metadata: dict = None, wait: bool = True, update: bool = False):
+        """Add a document whose text arrives incrementally."""
+        logger.debug(f"Streaming document with metadata: {metadata}")
+        return await self.vector_store.aadd_text_stream(text_stream, metadata, wait=wait, update=update) 
\ No newline at end of file
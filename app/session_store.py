@@ -0,0 +1,389 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+SESSION_BACKENDS = ("sqlite", "file")
+
+
+@dataclass
+class _CachedSession:
+    messages: List[Dict[str, str]]
+    size: int
+    needs_compaction: bool = False
+
+
+class SessionStore:
+    """Chat histories stored as append-only JSONL logs with a bounded LRU of hot sessions.
+
+    Each session lives in `<directory>/<session_id>.jsonl`, one message per
+    line, so a chat turn only appends its new messages. A crash mid-write can
+    at worst leave a torn last line, which is skipped on load and removed by
+    compaction. Sessions saved in the older pretty-printed `<session_id>.json`
+    format are still readable and are rewritten as JSONL on their next write.
+
+    `fsync_policy` controls durability: "always" fsyncs every append,
+    "interval" at most once per `fsync_interval_seconds` per session, and
+    "never" leaves flushing to the OS.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_sessions: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        fsync_policy: str = "interval",
+        fsync_interval_seconds: float = 1.0,
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync_policy!r}, expected one of {FSYNC_POLICIES}")
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.fsync_policy = fsync_policy
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._cached_bytes = 0
+        self._last_fsync: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _log_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def _legacy_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    @staticmethod
+    def _encode(message: Dict[str, str]) -> str:
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _load(self, session_id: str) -> _CachedSession:
+        log_path = self._log_path(session_id)
+        if os.path.exists(log_path):
+            messages = []
+            size = 0
+            needs_compaction = False
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        messages.append(json.loads(line))
+                        size += len(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping torn record in session log {log_path}")
+                        needs_compaction = True
+            return _CachedSession(messages, size, needs_compaction)
+
+        legacy_path = self._legacy_path(session_id)
+        if os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+            size = sum(len(self._encode(m)) for m in messages)
+            return _CachedSession(messages, size, needs_compaction=True)
+
+        return _CachedSession([], 0)
+
+    def _get_cached(self, session_id: str) -> _CachedSession:
+        session = self._cache.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+            self._cache[session_id] = session
+            self._cached_bytes += session.size
+        self._cache.move_to_end(session_id)
+        self._evict(keep=session_id)
+        return session
+
+    def _evict(self, keep: str):
+        while len(self._cache) > 1 and (
+            len(self._cache) > self.max_sessions or self._cached_bytes > self.max_bytes
+        ):
+            session_id, session = next(iter(self._cache.items()))
+            if session_id == keep:
+                break
+            del self._cache[session_id]
+            self._last_fsync.pop(session_id, None)
+            self._cached_bytes -= session.size
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        """Return the session history, loading it from disk on first use.
+
+        The returned list is a copy; use `append` to add messages.
+        """
+        with self._lock:
+            return list(self._get_cached(session_id).messages)
+
+    def append(self, session_id: str, *messages: Dict[str, str]):
+        """Append messages to the session log and the cached history."""
+        with self._lock:
+            session = self._get_cached(session_id)
+            if session.needs_compaction:
+                self._compact(session_id, session)
+
+            lines = [self._encode(m) for m in messages]
+            with open(self._log_path(session_id), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                self._maybe_fsync(session_id, f)
+
+            added = sum(len(line) for line in lines)
+            session.messages.extend(messages)
+            session.size += added
+            self._cached_bytes += added
+            self._evict(keep=session_id)
+
+    def _maybe_fsync(self, session_id: str, f):
+        if self.fsync_policy == "never":
+            return
+        now = time.monotonic()
+        last_fsync = self._last_fsync.get(session_id, 0.0)
+        if self.fsync_policy == "always" or now - last_fsync >= self.fsync_interval_seconds:
+            os.fsync(f.fileno())
+            self._last_fsync[session_id] = now
+
+    def compact(self, session_id: str):
+        """Rewrite the session log from the in-memory history, dropping torn records."""
+        with self._lock:
+            self._compact(session_id, self._get_cached(session_id))
+
+    def _compact(self, session_id: str, session: _CachedSession):
+        log_path = self._log_path(session_id)
+        tmp_path = log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(self._encode(m) for m in session.messages)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, log_path)
+
+        legacy_path = self._legacy_path(session_id)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        session.needs_compaction = False
+        logger.debug(f"Compacted session log {log_path}")
+
+
+# SQLite synchronous level matching each fsync policy; WAL with NORMAL only risks the last commits on power loss
+_SYNCHRONOUS = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID
+"""
+
+
+class SqliteSessionStore:
+    """Chat histories in one SQLite database in WAL mode, safe to share between worker processes.
+
+    Every message is a row keyed by (session_id, seq). Appends run in a
+    `BEGIN IMMEDIATE` transaction that takes the database write lock before
+    reading the session's last seq, so concurrent appends to one session, from
+    any thread or process, are kept in full and in commit order. Readers are
+    not blocked by writers.
+
+    Hot sessions are cached in a bounded LRU like SessionStore, but the cache
+    is only a prefix: `get` always asks the database for rows past the cached
+    length, so turns written by other workers are seen immediately.
+
+    On first use, JSONL and legacy JSON session files found in
+    `migrate_directory` are imported and renamed to `<name>.migrated`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_sessions: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        fsync_policy: str = "interval",
+        busy_timeout_seconds: float = 30.0,
+        migrate_directory: Optional[str] = None,
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync_policy!r}, expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.fsync_policy = fsync_policy
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        if migrate_directory:
+            self.migrate_files(migrate_directory)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be used concurrently."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_seconds,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute(f"PRAGMA synchronous={_SYNCHRONOUS[self.fsync_policy]}")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _insert(self, connection: sqlite3.Connection, session_id: str, messages) -> int:
+        """Append rows after the session's last seq; must run inside a write transaction."""
+        row = connection.execute(
+            "SELECT MAX(seq) FROM session_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        start = 0 if row[0] is None else row[0] + 1
+        connection.executemany(
+            "INSERT INTO session_messages (session_id, seq, message) VALUES (?, ?, ?)",
+            [(session_id, start + i, json.dumps(m, ensure_ascii=False, separators=(",", ":"))) for i, m in enumerate(messages)]
+        )
+        return start
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        """Return the session history. The returned list is a copy; use `append` to add messages."""
+        connection = self._connection()
+        with self._lock:
+            session = self._cache.get(session_id)
+            if session is None:
+                session = self._cache[session_id] = _CachedSession([], 0)
+            rows = connection.execute(
+                "SELECT message FROM session_messages WHERE session_id = ? AND seq >= ? ORDER BY seq",
+                (session_id, len(session.messages))
+            ).fetchall()
+            for (raw,) in rows:
+                session.messages.append(json.loads(raw))
+                session.size += len(raw)
+                self._cached_bytes += len(raw)
+            self._cache.move_to_end(session_id)
+            self._evict(keep=session_id)
+            return list(session.messages)
+
+    def _evict(self, keep: str):
+        while len(self._cache) > 1 and (
+            len(self._cache) > self.max_sessions or self._cached_bytes > self.max_bytes
+        ):
+            session_id, session = next(iter(self._cache.items()))
+            if session_id == keep:
+                break
+            del self._cache[session_id]
+            self._cached_bytes -= session.size
+
+    def append(self, session_id: str, *messages: Dict[str, str]):
+        """Append messages to the session in one transaction."""
+        if not messages:
+            return
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert(connection, session_id, messages)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        # The cache catches up with the new rows on the next get
+
+    def migrate_files(self, directory: str) -> int:
+        """Import JSONL / JSON session files from the file backend. Returns how many sessions were imported."""
+        paths = sorted(glob.glob(os.path.join(directory, "*.jsonl")) + glob.glob(os.path.join(directory, "*.json")))
+        if not paths:
+            return 0
+        reader = SessionStore(directory)
+        connection = self._connection()
+        imported = 0
+        for session_id in dict.fromkeys(os.path.splitext(os.path.basename(p))[0] for p in paths):
+            messages = reader._load(session_id).messages
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have migrated this session already
+                exists = connection.execute(
+                    "SELECT 1 FROM session_messages WHERE session_id = ? LIMIT 1", (session_id,)
+                ).fetchone()
+                if not exists and messages:
+                    self._insert(connection, session_id, messages)
+                    imported += 1
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            for path in (reader._log_path(session_id), reader._legacy_path(session_id)):
+                try:
+                    os.replace(path, path + ".migrated")
+                except FileNotFoundError:
+                    pass
+        if imported:
+            logger.info(f"Migrated {imported} session files from {directory} into {self.path}")
+        return imported
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+class SessionLocks:
+    """Per-session asyncio locks that serialize whole chat turns (read history, answer, append) within a worker.
+
+    A lock exists only while some request holds or waits for it. Across
+    workers, turns are still ordered by their append's commit.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        lock, users = self._locks.get(session_id, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[session_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[session_id]
+            if users == 1:
+                del self._locks[session_id]
+            else:
+                self._locks[session_id] = (lock, users - 1)
+
+
+def create_session_store(settings) -> Union[SessionStore, SqliteSessionStore]:
+    """Build the session backend selected by SESSION_BACKEND."""
+    if settings.session_backend == "sqlite":
+        return SqliteSessionStore(
+            settings.session_database_path or os.path.join(settings.sessions_directory, "sessions.db"),
+            max_sessions=settings.session_cache_max_sessions,
+            max_bytes=settings.session_cache_max_bytes,
+            fsync_policy=settings.session_fsync_policy,
+            migrate_directory=settings.sessions_directory if settings.session_migrate_files else None
+        )
+    if settings.session_backend != "file":
+        raise ValueError(f"Unknown session backend {settings.session_backend!r}, expected one of {SESSION_BACKENDS}")
+    return SessionStore(
+        settings.sessions_directory,
+        max_sessions=settings.session_cache_max_sessions,
+        max_bytes=settings.session_cache_max_bytes,
+        fsync_policy=settings.session_fsync_policy,
+        fsync_interval_seconds=settings.session_fsync_interval_seconds
+    )
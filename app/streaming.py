@@ -0,0 +1,61 @@
+import asyncio
+import json
+from typing import Any, Dict, Tuple
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+StreamEvent = Tuple[str, Dict[str, Any]]
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class AgentStreamHandler(AsyncCallbackHandler):
+    """Collects agent steps and final-answer tokens into a queue as they happen.
+
+    The ReAct agent streams its whole scratchpad ("Thought: ... Action: ..."),
+    so LLM tokens are buffered per call and only forwarded once the
+    "Final Answer:" marker has been seen. Calls that answer directly, without
+    the agent, set `passthrough` so every token is forwarded.
+    """
+
+    def __init__(self):
+        self.queue: "asyncio.Queue[StreamEvent | None]" = asyncio.Queue()
+        self.passthrough = False
+        self._buffer = ""
+        self._in_final_answer = False
+
+    def _reset(self):
+        self._buffer = ""
+        self._in_final_answer = self.passthrough
+
+    async def on_llm_start(self, serialized, prompts, **kwargs):
+        self._reset()
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._reset()
+
+    async def on_llm_new_token(self, token: str, **kwargs):
+        if self._in_final_answer:
+            await self.queue.put(("token", {"token": token}))
+            return
+        self._buffer += token
+        index = self._buffer.find(FINAL_ANSWER_PREFIX)
+        if index != -1:
+            self._in_final_answer = True
+            rest = self._buffer[index + len(FINAL_ANSWER_PREFIX):].lstrip()
+            if rest:
+                await self.queue.put(("token", {"token": rest}))
+
+    async def on_agent_action(self, action, **kwargs):
+        await self.queue.put(("step", {
+            "tool": action.tool,
+            "tool_input": action.tool_input,
+        }))
+
+    async def on_tool_end(self, output, **kwargs):
+        await self.queue.put(("observation", {"output": str(output)[:500]}))
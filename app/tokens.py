@@ -0,0 +1,28 @@
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for English text, used when no tiktoken encoding can be loaded
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache()
+def _encoding(model_name: str):
+    """The tiktoken encoding for a model, or None if tiktoken cannot load one (e.g. offline without a cache)."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"No tiktoken encoding available for {model_name}, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
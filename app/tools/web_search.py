@@ -1,6 +1,19 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from app.config import get_settings
-from langchain.tools import Tool
+from app.metrics import TOOL_CALLS, record_cache, stage
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
@@ -9,27 +22,209 @@ BRAVE_SEARCH_API_URL = "https://api.search.brave.com/res/v1/web/search"
 class BraveSearchError(Exception):
     pass
 
-def brave_search(query: str, num_results: int = 3):
-    """
-    Query the Brave Search API and return a list of results.
-    Each result is a dict with 'title', 'url', and 'snippet'.
+class TokenBucket:
+    """Token-bucket rate limiter shared by the sync and async search paths."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a fixed time."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if time.monotonic() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class BraveSearchClient:
+    """Brave Search client with keep-alive pooling, result caching, rate limiting and retries.
+
+    `search` and `asearch` share the same cache and rate limiter. Requests that
+    come back with 429 or a 5xx status are retried with exponential backoff,
+    honouring the Retry-After header when Brave sends one. `base_url` can be
+    pointed at a local server for testing.
     """
-    api_key = settings.brave_search_api_key
-    if not api_key:
-        raise BraveSearchError("Brave Search API key is not set in the configuration.")
-
-    headers = {
-        "Accept": "application/json",
-        "X-Subscription-Token": api_key,
-    }
-    params = {
-        "q": query,
-        "count": num_results,
-    }
-    response = requests.get(BRAVE_SEARCH_API_URL, headers=headers, params=params)
-    if response.status_code != 200:
-        raise BraveSearchError(f"Brave Search API error: {response.status_code} {response.text}")
-    data = response.json()
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = BRAVE_SEARCH_API_URL,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        rate_per_second: float = 1.0,
+        burst: float = 1.0,
+        cache_ttl_seconds: float = 600.0,
+        cache_max_entries: int = 1024,
+        pool_size: int = 10,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+        self.cache = TTLCache(cache_ttl_seconds, cache_max_entries)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def _request_args(self, query: str, count: int):
+        if not self.api_key:
+            raise BraveSearchError("Brave Search API key is not set in the configuration.")
+
+        headers = {
+            "Accept": "application/json",
+            "X-Subscription-Token": self.api_key,
+        }
+        params = {
+            "q": query,
+            "count": count,
+        }
+        return headers, params
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(0.5 * 2 ** attempt, 8.0) + random.uniform(0, 0.1)
+
+    @staticmethod
+    def _should_retry(status_code: int) -> bool:
+        return status_code == 429 or status_code >= 500
+
+    def search(self, query: str, count: int = 3) -> List[Dict[str, Optional[str]]]:
+        key = (query, count)
+        cached = self.cache.get(key)
+        record_cache("brave", cached is not None)
+        if cached is not None:
+            return cached
+
+        with stage("brave_search"):
+            results = self._fetch(query, count)
+        self.cache.put(key, results)
+        return results
+
+    def _fetch(self, query: str, count: int) -> List[Dict[str, Optional[str]]]:
+        headers, params = self._request_args(query, count)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self._session.get(self.base_url, headers=headers, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise BraveSearchError(f"Brave Search request failed: {str(e)}")
+                time.sleep(self._retry_delay(attempt, None))
+                continue
+            if self._should_retry(response.status_code) and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"Brave Search returned {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code != 200:
+                raise BraveSearchError(f"Brave Search API error: {response.status_code} {response.text}")
+            return _parse_results(response.json(), count)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+        return self._async_client
+
+    async def asearch(self, query: str, count: int = 3) -> List[Dict[str, Optional[str]]]:
+        key = (query, count)
+        cached = self.cache.get(key)
+        record_cache("brave", cached is not None)
+        if cached is not None:
+            return cached
+
+        with stage("brave_search"):
+            results = await self._afetch(query, count)
+        self.cache.put(key, results)
+        return results
+
+    async def _afetch(self, query: str, count: int) -> List[Dict[str, Optional[str]]]:
+        headers, params = self._request_args(query, count)
+        client = self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.aacquire()
+            try:
+                response = await client.get(self.base_url, headers=headers, params=params)
+            except httpx.HTTPError as e:
+                if attempt == self.max_retries:
+                    raise BraveSearchError(f"Brave Search request failed: {str(e)}")
+                await asyncio.sleep(self._retry_delay(attempt, None))
+                continue
+            if self._should_retry(response.status_code) and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"Brave Search returned {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code != 200:
+                raise BraveSearchError(f"Brave Search API error: {response.status_code} {response.text}")
+            return _parse_results(response.json(), count)
+
+    def close(self):
+        self._session.close()
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+def _parse_results(data: dict, num_results: int):
     results = []
     for item in data.get("web", {}).get("results", [])[:num_results]:
         results.append({
@@ -39,22 +234,61 @@ def brave_search(query: str, num_results: int = 3):
         })
     return results
 
+@lru_cache()
+def get_brave_client() -> BraveSearchClient:
+    return BraveSearchClient(
+        api_key=settings.brave_search_api_key,
+        base_url=settings.brave_search_api_url,
+        timeout=settings.brave_timeout_seconds,
+        max_retries=settings.brave_max_retries,
+        rate_per_second=settings.brave_rate_limit_per_second,
+        burst=settings.brave_rate_limit_burst,
+        cache_ttl_seconds=settings.brave_cache_ttl_seconds,
+        cache_max_entries=settings.brave_cache_max_entries,
+        pool_size=settings.brave_pool_size
+    )
+
+def brave_search(query: str, num_results: int = 3):
+    """
+    Query the Brave Search API and return a list of results.
+    Each result is a dict with 'title', 'url', and 'snippet'.
+    """
+    return get_brave_client().search(query, num_results)
+
+async def abrave_search(query: str, num_results: int = 3):
+    """Async version of brave_search that does not block the event loop."""
+    return await get_brave_client().asearch(query, num_results)
+
+def _format_results(results) -> str:
+    if not results:
+        return "No relevant web results found."
+    formatted = "Web search results:\n"
+    for i, r in enumerate(results, 1):
+        formatted += f"\n{i}. {r['title']}\n{r['url']}\n{r['snippet'] or ''}\n"
+    return formatted.strip()
+
 def brave_search_tool_func(query: str) -> str:
     """LangChain tool wrapper for brave_search. Returns formatted string of results."""
+    TOOL_CALLS.inc(tool="brave_search")
     try:
-        results = brave_search(query, num_results=3)
-        if not results:
-            return "No relevant web results found."
-        formatted = "Web search results:\n"
-        for i, r in enumerate(results, 1):
-            formatted += f"\n{i}. {r['title']}\n{r['url']}\n{r['snippet'] or ''}\n"
-        return formatted.strip()
+        return _format_results(brave_search(query, num_results=3))
+    except BraveSearchError as e:
+        return f"Brave Search error: {str(e)}"
+
+async def abrave_search_tool_func(query: str) -> str:
+    """Async LangChain tool wrapper for abrave_search."""
+    TOOL_CALLS.inc(tool="brave_search")
+    try:
+        return _format_results(await abrave_search(query, num_results=3))
     except BraveSearchError as e:
         return f"Brave Search error: {str(e)}"
 
 def get_brave_search_tool():
+    from langchain.tools import Tool
+
     return Tool(
         name="Brave Web Search",
         func=brave_search_tool_func,
+        coroutine=abrave_search_tool_func,
         description="Useful for answering questions about current events or when up-to-date information is needed from the web. Input should be a search query string."
     ) 
\ No newline at end of file
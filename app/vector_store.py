@@ -2,23 +2,90 @@ from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, DirectoryLoader
-from typing import List, Optional, Union
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from concurrent.futures import Future, wait as wait_futures
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import hashlib
 import os
 import logging
+import threading
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from app.config import get_settings
+from app.embedding_cache import CachedEmbeddings, content_hash
+from app.metrics import stage
+from app.write_batcher import WriteBatcher
+from app.document_registry import DocumentRecord, DocumentRegistry, document_id_for
+from app.lexical_index import BM25Index
+
+if TYPE_CHECKING:
+    from app.jobs import IngestJob, IngestJobQueue
 
 settings = get_settings()
 
+UPSERT_BATCH_SIZE = 500
+# Text buffered from a stream before it is split, and chunks buffered before they are embedded
+STREAM_SPLIT_CHARS = 32_000
+STREAM_EMBED_BATCH = 64
+
+def merge_stats(total: Dict[str, int], stats: Dict[str, int]) -> Dict[str, int]:
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+def chunk_id(text: str, metadata: dict) -> str:
+    """Content-derived id for a chunk, stable across re-uploads of the same source.
+
+    The source is part of the id, so text shared by several files (headers,
+    boilerplate) is stored once per file. Deduplication across documents only
+    skips re-embedding, through the embedding cache. One row per (source, text)
+    keeps per-document delete, update diffs and `filename` filters working, and
+    Chroma metadata cannot hold the list of sources a shared row would need.
+    """
+    source = metadata.get("filename") or metadata.get("source") or ""
+    return content_hash(source, text)
+
+# Collection metadata key recording which model produced the stored vectors
+EMBEDDING_MODEL_KEY = "embedding_model"
+VECTOR_INDEX_BACKENDS = ("chroma", "numpy")
+
+class EmbeddingModelMismatchError(Exception):
+    pass
+
+def create_embeddings() -> Tuple[Embeddings, str]:
+    """Build the configured embedding backend and the id it records on collections."""
+    if settings.embedding_backend == "local":
+        from app.local_embeddings import LocalEmbeddings
+        embeddings = LocalEmbeddings(
+            settings.local_embedding_model,
+            batch_size=settings.local_embedding_batch_size,
+            threads=settings.local_embedding_threads,
+            max_wait_ms=settings.local_embedding_max_wait_ms
+        )
+        return embeddings, f"local:{settings.local_embedding_model}"
+    if settings.embedding_backend != "openai":
+        raise ValueError(f"Unknown embedding backend: {settings.embedding_backend}")
+    embeddings = OpenAIEmbeddings(
+        model=settings.embedding_model,
+        openai_api_key=settings.openai_api_key
+    )
+    return embeddings, f"openai:{settings.embedding_model}"
+
 class VectorStore:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.embedding_model,
-            openai_api_key=settings.openai_api_key
+        # Ensure the cache directory exists
+        os.makedirs(settings.embedding_cache_directory, exist_ok=True)
+
+        underlying, self.embedding_model_id = create_embeddings()
+        self.embeddings = CachedEmbeddings(
+            underlying,
+            cache_directory=settings.embedding_cache_directory,
+            # OpenAI keeps the bare model name so existing cache entries stay valid
+            namespace=settings.embedding_model if settings.embedding_backend == "openai" else self.embedding_model_id,
+            count_tokens=settings.embedding_token_metrics
         )
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -28,13 +95,163 @@ class VectorStore:
         # Ensure the persist directory exists
         os.makedirs(settings.chroma_persist_directory, exist_ok=True)
         
-        self.vector_store = Chroma(
-            persist_directory=settings.chroma_persist_directory,
-            embedding_function=self.embeddings
+        # LangChain's Chroma wrapper; None with the numpy backend
+        self.vector_store: Optional[Chroma] = None
+        self._collection = self._open_collection()
+        self.registry = DocumentRegistry(
+            os.path.join(settings.chroma_persist_directory, f"{settings.chroma_collection_name}.documents.db"),
+            legacy_path=os.path.join(settings.chroma_persist_directory, f"{settings.chroma_collection_name}.documents.json")
         )
+        self.lexical_index = BM25Index(
+            os.path.join(settings.chroma_persist_directory, f"{settings.chroma_collection_name}.bm25.json")
+        )
+        if not self.registry.exists_on_disk or not self.lexical_index.exists_on_disk:
+            self._rebuild_indexes()
+        self._change_listeners: List[Callable[[], None]] = []
+        # Adds and deletes are group-committed; listeners hear about them once committed
+        self.writer = WriteBatcher(
+            get_collection=lambda: self.collection,
+            persist=self._persist_collection,
+            on_commit=self._after_commit,
+            on_failure=self._after_failed_commit,
+            max_batch_size=settings.vector_write_batch_rows,
+            max_delay_seconds=settings.vector_write_max_delay_ms / 1000
+        )
+
+    def _open_collection(self):
+        """Open the configured backend's collection: Chroma, or the memory-mapped NumPy index."""
+        if settings.vector_index_backend == "numpy":
+            collection = self._open_numpy_collection()
+        elif settings.vector_index_backend == "chroma":
+            self.vector_store = Chroma(
+                collection_name=settings.chroma_collection_name,
+                persist_directory=settings.chroma_persist_directory,
+                embedding_function=self.embeddings
+            )
+            collection = self.vector_store._collection
+        else:
+            raise ValueError(
+                f"Unknown vector index backend {settings.vector_index_backend!r}, expected one of {VECTOR_INDEX_BACKENDS}"
+            )
+        self._check_embedding_model(collection)
+        return collection
+
+    def _open_numpy_collection(self):
+        from app.numpy_index import NumpyCollection, migrate_from_chroma
+        directory = os.path.join(settings.vector_index_directory, settings.chroma_collection_name)
+        is_new = not os.path.exists(directory)
+        collection = NumpyCollection(
+            directory,
+            settings.chroma_collection_name,
+            dtype=settings.vector_index_dtype,
+            compact_ratio=settings.vector_index_compact_ratio
+        )
+        # One-shot migration: a new index starts from the Chroma collection of the same name, if there is one
+        if is_new and os.path.exists(os.path.join(settings.chroma_persist_directory, "chroma.sqlite3")):
+            import chromadb
+            client = chromadb.PersistentClient(path=settings.chroma_persist_directory)
+            if settings.chroma_collection_name in client.list_collections():
+                source = client.get_collection(settings.chroma_collection_name)
+                copied = migrate_from_chroma(source, collection, batch_size=UPSERT_BATCH_SIZE)
+                logger.info(f"Migrated {copied} chunks from Chroma collection '{source.name}' into {directory}")
+        return collection
+
+    def _persist_collection(self):
+        # The NumPy index fsyncs each append itself
+        if self.vector_store is not None:
+            self.vector_store.persist()
+
+    def _check_embedding_model(self, collection):
+        """Refuse to mix vectors from different embedding models in one collection."""
+        metadata = dict(collection.metadata or {})
+        recorded = metadata.get(EMBEDDING_MODEL_KEY)
+        if recorded is None and collection.count():
+            # Collections created before the model was recorded were always embedded with OpenAI
+            recorded = f"openai:{settings.embedding_model}"
+        if recorded is not None and recorded != self.embedding_model_id:
+            raise EmbeddingModelMismatchError(
+                f"Collection '{collection.name}' was embedded with {recorded}, but the configured "
+                f"embedding model is {self.embedding_model_id}. Use a different CHROMA_COLLECTION_NAME "
+                f"or re-ingest into a fresh collection."
+            )
+        if metadata.get(EMBEDDING_MODEL_KEY) != self.embedding_model_id:
+            # hnsw:* settings cannot be passed to modify(), even unchanged
+            metadata = {key: value for key, value in metadata.items() if not key.startswith("hnsw:")}
+            metadata[EMBEDDING_MODEL_KEY] = self.embedding_model_id
+            collection.modify(metadata=metadata)
+
+    @property
+    def collection(self):
+        return self._collection
 
-    def add_documents(self, text: Union[str, List[str]], metadata: Optional[Union[dict, List[dict]]] = None):
-        """Add documents to the vector store."""
+    def _rebuild_indexes(self):
+        """Build the document registry and BM25 index from chunks already in the collection."""
+        rebuild_registry = not self.registry.exists_on_disk
+        rebuild_lexical = not self.lexical_index.exists_on_disk
+        include = ["metadatas", "documents"] if rebuild_lexical else ["metadatas"]
+        offset = 0
+        while True:
+            page = self.collection.get(limit=UPSERT_BATCH_SIZE, offset=offset, include=include)
+            if not page["ids"]:
+                break
+            if rebuild_registry:
+                by_filename: Dict[str, List[str]] = {}
+                for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                    filename = (metadata or {}).get("filename") or (metadata or {}).get("source")
+                    if filename:
+                        by_filename.setdefault(filename, []).append(chunk_id)
+                for filename, chunk_ids in by_filename.items():
+                    self.registry.record_chunks(filename, chunk_ids)
+            if rebuild_lexical:
+                self.lexical_index.add(zip(page["ids"], page["documents"]))
+            offset += len(page["ids"])
+        if rebuild_lexical:
+            self.lexical_index.save()
+        logger.debug(f"Rebuilt indexes: {len(self.registry.list())} documents, {len(self.lexical_index)} chunks")
+
+    def _after_commit(self):
+        self.lexical_index.save()
+        self._notify_change()
+
+    def _after_failed_commit(self, ids: List[str]):
+        """Make BM25 and the registry match what the collection really holds for ids whose write failed.
+
+        Ids with newer writes still queued are left to those writes.
+        """
+        queued = self.writer.pending_state(ids)
+        ids = [i for i in ids if i not in queued]
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            batch_ids = ids[start:start + UPSERT_BATCH_SIZE]
+            stored = self.collection.get(ids=batch_ids, include=["documents", "metadatas"])
+            missing = list(set(batch_ids) - set(stored["ids"]))
+            self.lexical_index.remove(missing)
+            self.registry.remove_chunk_ids(missing)
+            self.lexical_index.add(zip(stored["ids"], stored["documents"]))
+            by_filename: Dict[str, List[str]] = {}
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+                filename = (metadata or {}).get("filename") or (metadata or {}).get("source")
+                if filename:
+                    by_filename.setdefault(filename, []).append(chunk_id)
+            for filename, chunk_ids in by_filename.items():
+                self.registry.record_chunks(filename, chunk_ids)
+        self.lexical_index.save()
+        logger.warning(f"Rolled back BM25 and registry entries for {len(ids)} chunks after a failed commit")
+
+    def add_change_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked whenever stored documents are added or removed."""
+        self._change_listeners.append(listener)
+
+    def generation(self) -> int:
+        """Changes whenever any worker sharing this collection adds or removes documents."""
+        return self.registry.generation()
+
+    def _notify_change(self):
+        self.registry.bump_generation()
+        for listener in self._change_listeners:
+            listener()
+
+    def split_documents(self, text: Union[str, List[str]], metadata: Optional[Union[dict, List[dict]]] = None):
+        """Split texts into chunks, returning the chunks and one metadata dict per chunk."""
         logger.debug(f"Input text type: {type(text)}")
         logger.debug(f"Input metadata type: {type(metadata)}")
         
@@ -45,43 +262,411 @@ class VectorStore:
             texts = text
             
         logger.debug(f"Number of texts to process: {len(texts)}")
+
+        # Prepare metadata, one entry per text
+        if metadata is None:
+            text_metadatas = [{}] * len(texts)
+        elif isinstance(metadata, dict):
+            text_metadatas = [metadata] * len(texts)
+        elif len(metadata) == 1:
+            text_metadatas = [metadata[0]] * len(texts)
+        else:
+            text_metadatas = metadata
         
         # Split texts into chunks
         chunks = []
-        for text in texts:
+        metadatas = []
+        for text, text_metadata in zip(texts, text_metadatas):
             if not isinstance(text, str):
                 raise ValueError(f"Expected string, got {type(text)}")
-            chunks.extend(self.text_splitter.split_text(text))
+            text_chunks = self.text_splitter.split_text(text)
+            chunks.extend(text_chunks)
+            metadatas.extend([text_metadata] * len(text_chunks))
         
         logger.debug(f"Number of chunks after splitting: {len(chunks)}")
+        return chunks, metadatas
+
+    def add_chunks(self, chunks: List[str], metadatas: List[dict], wait: bool = True) -> Dict[str, int]:
+        """Embed and store chunks, skipping ones that are already in the collection.
+
+        Returns counts of chunks seen, duplicates skipped, embedding cache hits
+        and chunks that had to be newly embedded. With `wait` the call returns
+        only after the write has been committed.
+        """
+        stats, futures = self._queue_chunks(chunks, metadatas)
+        if wait:
+            _wait_committed(futures)
+        return stats
+
+    def _queue_chunks(
+        self,
+        chunks: List[str],
+        metadatas: List[dict],
+        seen: Optional[set] = None
+    ) -> Tuple[Dict[str, int], List[Future]]:
+        # Collapse repeated chunks within the batch
+        unique = {}
+        filenames: Dict[str, str] = {}
+        for chunk, metadata in zip(chunks, metadatas):
+            filename = metadata.get("filename") or metadata.get("source")
+            if filename:
+                metadata = {**metadata, "document_id": document_id_for(filename)}
+            i = chunk_id(chunk, metadata)
+            if i not in unique:
+                unique[i] = (chunk, metadata)
+                if filename:
+                    filenames[i] = filename
+
+        if seen is not None:
+            seen.update(unique)
+
+        stats = {"chunks": len(chunks), "duplicates": len(chunks), "cache_hits": 0, "embedded": 0}
+        futures = []
+        ids = list(unique)
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            batch_ids = ids[start:start + UPSERT_BATCH_SIZE]
+            existing = set(self.collection.get(ids=batch_ids, include=[])["ids"])
+            # Writes still waiting for a group commit take precedence over what is stored
+            for i, is_upsert in self.writer.pending_state(batch_ids).items():
+                if is_upsert:
+                    existing.add(i)
+                else:
+                    existing.discard(i)
+            new_ids = [i for i in batch_ids if i not in existing]
+            if new_ids:
+                texts = [unique[i][0] for i in new_ids]
+                with stage("embed_documents"):
+                    vectors, hits = self.embeddings.embed_documents_with_stats(texts)
+
+            # Registered right before the write is queued, so a failed commit can undo it
+            by_filename: Dict[str, List[str]] = {}
+            for i in batch_ids:
+                if i in filenames:
+                    by_filename.setdefault(filenames[i], []).append(i)
+            for filename, chunk_ids in by_filename.items():
+                self.registry.record_chunks(filename, chunk_ids)
+            if not new_ids:
+                continue
+            self.lexical_index.add(zip(new_ids, texts))
+            futures.append(self.writer.upsert(
+                ids=new_ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[{**unique[i][1], "content_hash": content_hash(unique[i][0])} for i in new_ids]
+            ))
+            stats["duplicates"] -= len(new_ids)
+            stats["cache_hits"] += hits
+            stats["embedded"] += len(new_ids) - hits
+
+        logger.debug(f"Ingest stats: {stats}")
+        return stats, futures
+
+    def add_documents(
+        self,
+        text: Union[str, List[str]],
+        metadata: Optional[Union[dict, List[dict]]] = None,
+        wait: bool = True,
+        update: bool = False
+    ) -> Dict[str, int]:
+        """Add documents to the vector store.
+
+        With `update`, the new chunks are diffed against what is stored for the
+        same filenames: only new chunks are embedded, chunks no longer present
+        are deleted, unchanged ones are left alone, and the diff is reported as
+        added / removed / unchanged.
+        """
+        chunks, metadatas = self.split_documents(text, metadata)
+        old_ids = self._stored_chunk_ids(metadatas) if update else None
+        seen = set() if update else None
+        stats, futures = self._queue_chunks(chunks, metadatas, seen)
+        if update:
+            diff, delete_future = self._remove_stale_chunks(old_ids, seen)
+            merge_stats(stats, diff)
+            if delete_future is not None:
+                futures.append(delete_future)
+        if wait:
+            _wait_committed(futures)
+        # A document only counts as ingested, and so unchanged on re-upload, once its chunks are stored
+        _when_committed(futures, lambda: self.record_document_hashes([text] if isinstance(text, str) else text, metadata))
         
-        # Prepare metadata
+        logger.debug("Documents added successfully")
+        return stats
+
+    def _stored_chunk_ids(self, metadatas: List[dict]) -> Dict[str, set]:
+        """Chunk ids currently registered for each filename in the metadata."""
+        old_ids = {}
+        for metadata in metadatas:
+            filename = metadata.get("filename") or metadata.get("source")
+            if filename and filename not in old_ids:
+                record = self.registry.find_by_filename(filename)
+                old_ids[filename] = set(record.chunk_ids) if record else set()
+        return old_ids
+
+    def _remove_stale_chunks(self, old_ids: Dict[str, set], seen: set) -> Tuple[Dict[str, int], Optional[Future]]:
+        """Delete previously stored chunks that the new version no longer contains."""
+        previous = set().union(*old_ids.values())
+        removed = list(previous - seen)
+        future = self.writer.delete(removed) if removed else None
+        self.registry.remove_chunk_ids(removed)
+        self.lexical_index.remove(removed)
+        diff = {
+            "added": len(seen - previous),
+            "removed": len(removed),
+            "unchanged": len(seen & previous)
+        }
+        logger.debug(f"Document update diff: {diff}")
+        return diff, future
+
+    def persist(self):
+        """Commit any pending writes now."""
+        self.writer.flush()
+
+    def close(self):
+        """Commit pending writes, stop the write batcher and fold the BM25 log into its snapshot."""
+        self.writer.close()
+        self.lexical_index.snapshot()
+        close_embeddings = getattr(self.embeddings.underlying, "close", None)
+        if close_embeddings is not None:
+            close_embeddings()
+
+    def write_stats(self) -> Dict[str, Any]:
+        return self.writer.stats()
+
+    def count(self, where: Optional[dict] = None) -> int:
+        """Number of stored chunks, optionally restricted by a metadata filter."""
+        if not where:
+            return self.collection.count()
+        return len(self.collection.get(where=where, include=[])["ids"])
+
+    def get_chunks(
+        self,
+        limit: int,
+        offset: int = 0,
+        where: Optional[dict] = None,
+        include: Tuple[str, ...] = ("documents", "metadatas")
+    ) -> Dict[str, Any]:
+        """Fetch one page of stored chunks, loading only the requested fields."""
+        return self.collection.get(limit=limit, offset=offset, where=where or None, include=list(include))
+
+    def summary(self) -> Dict[str, Any]:
+        """Collection name, chunk count and embedding dimension, without scanning documents."""
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        return {
+            "name": self.collection.name,
+            "count": self.collection.count(),
+            "embedding_model": self.embedding_model_id,
+            "embedding_dimension": len(embeddings[0]) if embeddings is not None and len(embeddings) else None
+        }
+
+    def record_document_hashes(self, texts: List[str], metadata: Optional[Union[dict, List[dict]]]):
+        """Store a content hash for each document that the given texts belong to."""
         if metadata is None:
-            metadatas = [{}] * len(chunks)
-        elif isinstance(metadata, dict):
-            metadatas = [metadata] * len(chunks)
+            return
+        metadatas = [metadata] * len(texts) if isinstance(metadata, dict) else metadata
+        if len(metadatas) == 1:
+            metadatas = metadatas * len(texts)
+        hashes: Dict[str, Any] = {}
+        for text, text_metadata in zip(texts, metadatas):
+            filename = text_metadata.get("filename") or text_metadata.get("source")
+            if filename:
+                hashes.setdefault(filename, hashlib.sha256()).update(text.encode("utf-8"))
+        for filename, digest in hashes.items():
+            self.registry.record_chunks(filename, [], content_hash=digest.hexdigest())
+
+    def list_documents(self) -> List[DocumentRecord]:
+        return self.registry.list()
+
+    def get_document(self, document_id: str) -> Optional[DocumentRecord]:
+        return self.registry.get(document_id)
+
+    def delete(self, ids: List[str], wait: bool = True) -> int:
+        """Delete chunks by id."""
+        future = self.writer.delete(ids)
+        self.registry.remove_chunk_ids(ids)
+        self.lexical_index.remove(ids)
+        if wait:
+            _wait_committed([future])
+        return len(ids)
+
+    def delete_document(self, document_id: str, wait: bool = True) -> Optional[int]:
+        """Delete every chunk of a document in one bulk delete. Returns None if the document is unknown."""
+        record = self.registry.remove(document_id)
+        if record is None:
+            return None
+        future = self.writer.delete(record.chunk_ids)
+        self.lexical_index.remove(record.chunk_ids)
+        if wait:
+            _wait_committed([future])
+        return len(record.chunk_ids)
+
+    def truncate(self) -> int:
+        """Delete every chunk, keeping the collection itself so other workers' handles stay valid.
+
+        Chroma rows are deleted in place in batches. The NumPy index switches
+        to an empty generation, which other processes pick up on their next call.
+        """
+        self.writer.flush()
+        deleted_count = 0
+        if self.vector_store is not None:
+            while ids := self.collection.get(limit=UPSERT_BATCH_SIZE, include=[])["ids"]:
+                self.collection.delete(ids=ids)
+                deleted_count += len(ids)
+            self._persist_collection()
         else:
-            if len(metadata) == 1:
-                metadatas = [metadata[0]] * len(chunks)
-            else:
-                metadatas = metadata
-                
-        logger.debug(f"Number of metadata entries: {len(metadatas)}")
-        
-        # Add to vector store
-        self.vector_store.add_texts(chunks, metadatas=metadatas)
-        self.vector_store.persist()
-        
-        logger.debug("Documents added successfully")
+            deleted_count = self.collection.count()
+            self.collection.drop()
+            self._check_embedding_model(self.collection)
+        self.registry.clear()
+        self.lexical_index.clear()
+        self.lexical_index.save()
+        self._notify_change()
+        return deleted_count
+
+    async def aadd_text_stream(
+        self,
+        text_stream: AsyncIterator[str],
+        metadata: Optional[dict] = None,
+        wait: bool = True,
+        update: bool = False
+    ) -> Dict[str, int]:
+        """Split, embed and store text as it arrives, keeping memory bounded.
+
+        Text is buffered up to STREAM_SPLIT_CHARS before splitting; the last,
+        possibly incomplete chunk is carried over into the next buffer so chunk
+        boundaries match splitting the whole text at once as closely as possible.
+        `update` works as in add_documents.
+        """
+        metadata = metadata or {}
+        stats = {"chunks": 0, "duplicates": 0, "cache_hits": 0, "embedded": 0}
+        futures: List[Future] = []
+        old_ids = self._stored_chunk_ids([metadata]) if update else None
+        seen = set() if update else None
+        digest = hashlib.sha256()
+        buffer = ""
+        pending: List[str] = []
+
+        async def flush(chunks: List[str]):
+            batch_stats, batch_futures = await asyncio.to_thread(
+                self._queue_chunks, chunks, [metadata] * len(chunks), seen
+            )
+            merge_stats(stats, batch_stats)
+            futures.extend(batch_futures)
+
+        async for text in text_stream:
+            digest.update(text.encode("utf-8"))
+            buffer += text
+            if len(buffer) < STREAM_SPLIT_CHARS:
+                continue
+            chunks = self.text_splitter.split_text(buffer)
+            buffer = chunks.pop() if chunks else ""
+            pending.extend(chunks)
+            if len(pending) >= STREAM_EMBED_BATCH:
+                await flush(pending)
+                pending = []
+
+        pending.extend(self.text_splitter.split_text(buffer))
+        if pending:
+            await flush(pending)
+        if not stats["chunks"]:
+            raise ValueError("No text could be extracted from the file")
+        if update:
+            diff, delete_future = self._remove_stale_chunks(old_ids, seen)
+            merge_stats(stats, diff)
+            if delete_future is not None:
+                futures.append(delete_future)
+
+        if wait:
+            await asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+        filename = metadata.get("filename") or metadata.get("source")
+        if filename:
+            _when_committed(futures, lambda: self.registry.record_chunks(filename, [], content_hash=digest.hexdigest()))
+        return stats
 
     def similarity_search(self, query: str, k: int = 4):
         """Search for similar documents."""
-        return self.vector_store.similarity_search(query, k=k)
+        return self.vector_search(query, k)
+
+    def lexical_search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """BM25 keyword search; returns (chunk_id, score) pairs without touching the embedding API."""
+        with stage("lexical_search"):
+            return self.lexical_index.search(query, k)
+
+    def vector_search(self, query: str, k: int = 4) -> List[Document]:
+        """Embedding similarity search returning documents with their chunk ids set."""
+        with stage("embed_query"):
+            embedding = self.embeddings.embed_query(query)
+        with stage("vector_query"):
+            results = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=k,
+                include=["documents", "metadatas"]
+            )
+        return [
+            Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Fetch chunks by id, in the order given."""
+        if not ids:
+            return []
+        with stage("vector_get"):
+            results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def load_documents_from_directory(
+        self,
+        directory_path: str,
+        job_queue: Optional["IngestJobQueue"] = None
+    ) -> Union[Dict[str, int], "IngestJob"]:
+        """Load documents from a directory and add them to the vector store.
+
+        With a job queue the files are submitted as a background ingest job,
+        which is returned instead of the ingest stats.
+        """
+        if job_queue is not None:
+            files = []
+            for root, _, names in os.walk(directory_path):
+                for name in sorted(names):
+                    if name.endswith(".txt"):
+                        path = os.path.join(root, name)
+                        files.append((path, os.path.relpath(path, directory_path), "text/plain"))
+            return job_queue.submit(files)
 
-    def load_documents_from_directory(self, directory_path: str):
-        """Load documents from a directory and add them to the vector store."""
         loader = DirectoryLoader(directory_path, glob="**/*.txt", loader_cls=TextLoader)
         documents = loader.load()
-        texts = self.text_splitter.split_documents(documents)
-        self.vector_store.add_documents(texts)
-        self.vector_store.persist() 
\ No newline at end of file
+        stats = self.add_documents(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents]
+        )
+        return stats
+
+def _wait_committed(futures: List[Future]):
+    wait_futures(futures)
+    for future in futures:
+        future.result()
+
+
+def _when_committed(futures: List[Future], callback: Callable[[], None]):
+    """Run `callback` once every write has committed, right away if they already have; never if one fails."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    if not futures:
+        callback()
+    for future in futures:
+        future.add_done_callback(done)
@@ -0,0 +1,227 @@
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+import threading
+import time
+
+from app.metrics import STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Rows sent to Chroma in a single upsert/delete call
+MAX_ROWS_PER_CALL = 1000
+
+
+@dataclass
+class _Op:
+    kind: str  # "upsert" or "delete"
+    ids: List[str]
+    future: Future = field(default_factory=Future)
+    embeddings: Optional[List[List[float]]] = None
+    documents: Optional[List[str]] = None
+    metadatas: Optional[List[dict]] = None
+
+
+class WriteBatcher:
+    """Group-commits writes to a Chroma collection from a background thread.
+
+    Upserts and deletes are queued and committed together once
+    `max_batch_size` rows are pending or the oldest pending write is
+    `max_delay_seconds` old, followed by a single persist. Each write returns a
+    Future that resolves when its batch has been committed, so callers that
+    need durability can wait on it while others return immediately.
+
+    Writes stay visible to `pending_state` until their commit finishes. If a
+    commit fails, `on_failure` is called with the ids it held before the
+    futures are failed, so callers can undo changes made alongside the write.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Any],
+        persist: Callable[[], None],
+        on_commit: Optional[Callable[[], None]] = None,
+        on_failure: Optional[Callable[[List[str]], None]] = None,
+        max_batch_size: int = 500,
+        max_delay_seconds: float = 0.05,
+    ):
+        self._get_collection = get_collection
+        self._persist = persist
+        self._on_commit = on_commit
+        self._on_failure = on_failure
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+
+        self._ops: List[_Op] = []
+        # Ops taken by the running flush, still pending until the commit finishes
+        self._committing: List[_Op] = []
+        self._pending_rows = 0
+        self._oldest_at: Optional[float] = None
+        self._condition = threading.Condition()
+        self._commit_lock = threading.Lock()
+        self._closed = False
+
+        self._commits = 0
+        self._rows_committed = 0
+        self._max_batch_rows = 0
+        self._recent_batch_rows = deque(maxlen=256)
+        self._recent_latencies = deque(maxlen=256)
+
+        self._thread = threading.Thread(target=self._run, name="vector-write-batcher", daemon=True)
+        self._thread.start()
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]) -> Future:
+        return self._submit(_Op("upsert", ids, embeddings=embeddings, documents=documents, metadatas=metadatas))
+
+    def delete(self, ids: List[str]) -> Future:
+        return self._submit(_Op("delete", ids))
+
+    def _submit(self, op: _Op) -> Future:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write batcher is closed")
+            self._ops.append(op)
+            self._pending_rows += len(op.ids)
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            self._condition.notify()
+        return op.future
+
+    def pending_state(self, ids: Iterable[str]) -> Dict[str, bool]:
+        """For ids with queued writes, whether the last queued write is an upsert (True) or a delete (False)."""
+        wanted = set(ids)
+        state = {}
+        with self._condition:
+            for op in self._committing + self._ops:
+                for i in op.ids:
+                    if i in wanted:
+                        state[i] = op.kind == "upsert"
+        return state
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._ops and not self._closed:
+                    self._condition.wait()
+                if not self._ops and self._closed:
+                    return
+                # Give other writers a chance to join the batch
+                while not self._closed and self._pending_rows < self.max_batch_size:
+                    remaining = self._oldest_at + self.max_delay_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            self.flush()
+
+    def flush(self):
+        """Commit everything queued so far, in submission order."""
+        with self._commit_lock:
+            with self._condition:
+                ops, self._ops = self._ops, []
+                self._committing = ops
+                self._pending_rows = 0
+                self._oldest_at = None
+            if not ops:
+                return
+
+            started = time.perf_counter()
+            try:
+                collection = self._get_collection()
+                for group in _group_consecutive(ops):
+                    _apply(collection, group)
+                self._persist()
+            except Exception as e:
+                logger.error(f"Vector store batch commit failed: {str(e)}")
+                with self._condition:
+                    self._committing = []
+                if self._on_failure is not None:
+                    try:
+                        self._on_failure(list(dict.fromkeys(i for op in ops for i in op.ids)))
+                    except Exception as rollback_error:
+                        logger.error(f"Rolling back failed vector store writes failed: {str(rollback_error)}")
+                for op in ops:
+                    op.future.set_exception(e)
+                return
+            with self._condition:
+                self._committing = []
+
+            latency = time.perf_counter() - started
+            STAGE_LATENCY.observe(latency, stage="vector_commit")
+            rows = sum(len(op.ids) for op in ops)
+            self._commits += 1
+            self._rows_committed += rows
+            self._max_batch_rows = max(self._max_batch_rows, rows)
+            self._recent_batch_rows.append(rows)
+            self._recent_latencies.append(latency)
+            logger.debug(f"Committed {rows} vector store rows from {len(ops)} writes in {latency * 1000:.1f} ms")
+
+            for op in ops:
+                op.future.set_result(len(op.ids))
+            if self._on_commit is not None:
+                self._on_commit()
+
+    def close(self):
+        """Commit pending writes and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._recent_latencies)
+        batch_rows = list(self._recent_batch_rows)
+        with self._condition:
+            pending_rows = self._pending_rows
+        return {
+            "commits": self._commits,
+            "rows_committed": self._rows_committed,
+            "pending_rows": pending_rows,
+            "max_batch_rows": self._max_batch_rows,
+            "avg_batch_rows": sum(batch_rows) / len(batch_rows) if batch_rows else None,
+            "commit_latency_ms_p50": _percentile(latencies, 0.5),
+            "commit_latency_ms_p95": _percentile(latencies, 0.95),
+            "commit_latency_ms_max": latencies[-1] * 1000 if latencies else None,
+        }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index] * 1000
+
+
+def _group_consecutive(ops: List[_Op]) -> List[List[_Op]]:
+    groups: List[List[_Op]] = []
+    for op in ops:
+        if groups and groups[-1][0].kind == op.kind:
+            groups[-1].append(op)
+        else:
+            groups.append([op])
+    return groups
+
+
+def _apply(collection, group: List[_Op]):
+    if group[0].kind == "delete":
+        ids = list(dict.fromkeys(i for op in group for i in op.ids))
+        for start in range(0, len(ids), MAX_ROWS_PER_CALL):
+            collection.delete(ids=ids[start:start + MAX_ROWS_PER_CALL])
+        return
+
+    # Chroma rejects repeated ids within one call; the latest write wins
+    rows = {}
+    for op in group:
+        for row in zip(op.ids, op.embeddings, op.documents, op.metadatas):
+            rows[row[0]] = row
+    rows = list(rows.values())
+    for start in range(0, len(rows), MAX_ROWS_PER_CALL):
+        ids, embeddings, documents, metadatas = zip(*rows[start:start + MAX_ROWS_PER_CALL])
+        collection.upsert(
+            ids=list(ids),
+            embeddings=list(embeddings),
+            documents=list(documents),
+            metadatas=list(metadatas)
+        )
@@ -0,0 +1,52 @@
+"""Compare two benchmark result files written by benchmarks/run.py.
+
+    python benchmarks/compare.py benchmarks/results/OLD.json benchmarks/results/NEW.json
+"""
+from typing import Optional
+import argparse
+import json
+
+
+def change(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if old == 0:
+        return "n/a" if new == 0 else "+inf"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {(baseline['git']['commit'] or '?')[:8]}  {baseline['started_at']}")
+    print(f"candidate: {(candidate['git']['commit'] or '?')[:8]}  {candidate['started_at']}")
+    if baseline["config"] != candidate["config"]:
+        print("warning: runs used different configurations")
+    print()
+    print(f"{'scenario':12s} {'metric':10s} {'baseline':>10s} {'candidate':>10s} {'change':>9s}")
+    for name in baseline["scenarios"]:
+        if name not in candidate["scenarios"]:
+            continue
+        old, new = baseline["scenarios"][name], candidate["scenarios"][name]
+        rows = [("req/s", old["throughput_rps"], new["throughput_rps"])]
+        rows += [(f"{p} ms", old["latency_ms"][p], new["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        rows.append(("errors", sum(old["errors"].values()), sum(new["errors"].values())))
+        for metric, old_value, new_value in rows:
+            print(f"{name:12s} {metric:10s} {str(old_value):>10s} {str(new_value):>10s} {change(old_value, new_value):>9s}")
+    print(f"{'process':12s} {'peak RSS':10s} {baseline['peak_rss_mb']:>10} {candidate['peak_rss_mb']:>10} "
+          f"{change(baseline['peak_rss_mb'], candidate['peak_rss_mb']):>9s}")
+    old_ready = baseline.get("startup", {}).get("ready_seconds")
+    new_ready = candidate.get("startup", {}).get("ready_seconds")
+    print(f"{'process':12s} {'ready s':10s} {str(old_ready):>10s} {str(new_ready):>10s} {change(old_ready, new_ready):>9s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Local stand-ins for the OpenAI and Brave Search APIs, for offline benchmarking.
+
+Serves just enough of each API for the app to run against it:
+
+- POST /v1/chat/completions  (streaming and non-streaming; always ends in "Final Answer:")
+- POST /v1/embeddings        (deterministic vectors, float or base64 encoded)
+- GET  /res/v1/web/search    (Brave-shaped web results)
+
+Every endpoint sleeps for a latency drawn from a configurable distribution, see
+`LatencyModel.parse`. Run standalone with
+
+    python benchmarks/fake_backends.py --port 9100 --llm-latency lognormal:400:0.5
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class LatencyModel:
+    """Random latency in seconds, described by a spec string.
+
+    - "0" or "none": no delay
+    - "fixed:MS"
+    - "uniform:LOW_MS:HIGH_MS"
+    - "normal:MEAN_MS:STD_MS" (clipped at 0)
+    - "lognormal:MEDIAN_MS:SIGMA" (long right tail, like real API latency)
+    """
+
+    def __init__(self, kind: str, params: List[float]):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        if kind in ("0", "none"):
+            return cls("none", [])
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}")
+        return cls(kind, [float(p) for p in params])
+
+    def sample(self) -> float:
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = max(0.0, random.gauss(*self.params))
+        else:
+            median, sigma = self.params
+            ms = median * random.lognormvariate(0.0, sigma)
+        return ms / 1000
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{p:g}" for p in self.params)])
+
+
+def _fake_vector(value: Any, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(json.dumps(value).encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _answer_for(messages: List[Dict[str, Any]]) -> str:
+    content = messages[-1].get("content") if messages else ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    tail = " ".join(str(content).split()[-8:])
+    # The ReAct agent stops as soon as it sees a final answer
+    return f"Thought: I can answer this directly.\nFinal Answer: Benchmark answer regarding: {tail}"
+
+
+def create_app(
+    llm_latency: LatencyModel,
+    embedding_latency: LatencyModel,
+    brave_latency: LatencyModel,
+    embedding_dimension: int = 1536,
+    stream_chunk_chars: int = 16
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI / Brave backends")
+    app.state.calls = {"chat": 0, "embeddings": 0, "brave": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls["chat"] += 1
+        await asyncio.sleep(llm_latency.sample())
+        answer = _answer_for(body.get("messages", []))
+        model = body.get("model", "fake")
+        created = int(time.time())
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(answer.split()),
+            "total_tokens": prompt_tokens + len(answer.split())
+        }
+
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> str:
+            data = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if usage is not None:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(answer), stream_chunk_chars):
+                yield chunk({"content": answer[start:start + stream_chunk_chars]})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.calls["embeddings"] += 1
+        await asyncio.sleep(embedding_latency.sample())
+        inputs = body.get("input", [])
+        # A single string, a token list, or a batch of either
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimension = body.get("dimensions") or embedding_dimension
+        base64_encoded = body.get("encoding_format") == "base64"
+        data = []
+        for index, value in enumerate(inputs):
+            vector = _fake_vector(value, dimension)
+            encoded = base64.b64encode(vector.tobytes()).decode("ascii") if base64_encoded else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": encoded})
+        tokens = sum(len(v) if isinstance(v, list) else len(str(v).split()) for v in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.get("/res/v1/web/search")
+    async def brave_search(q: str = "", count: int = 3):
+        app.state.calls["brave"] += 1
+        await asyncio.sleep(brave_latency.sample())
+        results = [
+            {
+                "title": f"Result {i + 1} for {q}",
+                "url": f"https://example.com/{hashlib.md5(q.encode('utf-8')).hexdigest()[:8]}/{i + 1}",
+                "description": f"Snippet {i + 1} about {q}."
+            }
+            for i in range(count)
+        ]
+        return JSONResponse({"web": {"results": results}})
+
+    @app.get("/calls")
+    async def calls():
+        return app.state.calls
+
+    return app
+
+
+class FakeBackendServer:
+    """Runs the fake backends with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 9100):
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self._thread = threading.Thread(target=self.server.run, name="fake-backends", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Fake backends failed to start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI and Brave Search APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency", default="lognormal:400:0.5")
+    parser.add_argument("--embedding-latency", default="lognormal:40:0.3")
+    parser.add_argument("--brave-latency", default="lognormal:150:0.4")
+    parser.add_argument("--embedding-dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    app = create_app(
+        LatencyModel.parse(args.llm_latency),
+        LatencyModel.parse(args.embedding_latency),
+        LatencyModel.parse(args.brave_latency),
+        embedding_dimension=args.embedding_dimension
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Offline load test for the chatbot API.
+
+Starts the fake OpenAI / Brave backends, launches the app (`main:app`) under
+uvicorn pointed at them with throwaway data directories, waits for `/ready`,
+then drives each scenario at the requested concurrency:
+
+- upload_text: POST /upload with generated text documents
+- upload_pdf:  POST /upload with generated multi-page PDFs
+- chat:        POST /chat with a mix of small talk, document, web and open questions
+- embeddings:  GET /embeddings, paging through stored chunks
+- web_search:  POST /web_search
+
+After upload_pdf, one PDF is read back through /embeddings to check that its
+chunks carry per-page `page` metadata; the run exits with status 1 if not.
+
+Throughput, latency percentiles, error counts and the app's peak RSS are
+written as JSON to `--output-dir` (one file per run, named by time and git
+commit) and can be compared with `benchmarks/compare.py`.
+
+    python benchmarks/run.py --concurrency 16 --requests 200 --llm-latency lognormal:400:0.5
+"""
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_backends import FakeBackendServer, LatencyModel, create_app  # noqa: E402
+import workload  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["upload_text", "upload_pdf", "chat", "embeddings", "web_search"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    def git(*args) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def read_rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident set size of a process, from /proc (Linux only)."""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    values["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    values["peak_rss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(ms.mean()), 2),
+        "max": round(float(ms.max()), 2)
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int
+) -> Dict:
+    """Issue `total` requests with at most `concurrency` in flight."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    next_index = iter(range(total))
+
+    async def worker():
+        for index in next_index:
+            start = time.perf_counter()
+            try:
+                response = await send(client, index)
+                statuses[str(response.status_code)] += 1
+                if response.status_code >= 400:
+                    errors[f"HTTP {response.status_code}"] += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "succeeded": len(latencies),
+        "errors": dict(errors),
+        "status_codes": dict(statuses),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": summarize_latencies(latencies)
+    }
+
+
+def scenario_senders(args) -> Dict[str, Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]]:
+    pdf_cache: Dict[int, bytes] = {}
+
+    async def upload_text(client, i):
+        body = workload.text_document(i, args.text_bytes)
+        return await client.post("/upload", files={"file": (f"bench-{i}.txt", body, "text/plain")})
+
+    async def upload_pdf(client, i):
+        if i not in pdf_cache:
+            pdf_cache[i] = workload.pdf_document(10_000 + i, args.pdf_pages)
+        return await client.post("/upload", files={"file": (f"bench-{i}.pdf", pdf_cache.pop(i), "application/pdf")})
+
+    async def chat(client, i):
+        return await client.post("/chat", json={
+            "message": workload.question(i),
+            "session_id": f"bench-{i % args.sessions}"
+        })
+
+    async def embeddings(client, i):
+        return await client.get("/embeddings", params={"limit": 100, "offset": (i * 100) % 1000})
+
+    async def web_search(client, i):
+        return await client.post("/web_search", json={"query": workload.search_query(i), "num_results": 3})
+
+    return {
+        "upload_text": upload_text,
+        "upload_pdf": upload_pdf,
+        "chat": chat,
+        "embeddings": embeddings,
+        "web_search": web_search,
+    }
+
+
+def app_environment(args, backend_url: str, data_directory: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_API_BASE": f"{backend_url}/v1",
+        "OPENAI_BASE_URL": f"{backend_url}/v1",
+        "BRAVE_SEARCH_API_KEY": "benchmark",
+        "BRAVE_SEARCH_API_URL": f"{backend_url}/res/v1/web/search",
+        "BRAVE_RATE_LIMIT_PER_SECOND": "100000",
+        "BRAVE_RATE_LIMIT_BURST": "100000",
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(data_directory, "chroma"),
+        "EMBEDDING_CACHE_DIRECTORY": os.path.join(data_directory, "embedding_cache"),
+        "SESSIONS_DIRECTORY": os.path.join(data_directory, "sessions"),
+        "UPLOADS_DIRECTORY": os.path.join(data_directory, "uploads"),
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "ANONYMIZED_TELEMETRY": "False",
+        "LOG_LEVEL": "WARNING",
+    })
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    return env
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup with status {process.returncode}")
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"App was not ready within {timeout} seconds")
+
+
+async def check_pdf_pages(client: httpx.AsyncClient, pages: int) -> Dict:
+    """Check that an uploaded multi-page PDF was stored with per-page `page` metadata."""
+    response = await client.get(
+        "/embeddings", params={"filename": "bench-0.pdf", "limit": 1000, "include": ["metadatas"]}
+    )
+    if response.status_code != 200:
+        return {"ok": False, "detail": f"HTTP {response.status_code}"}
+    stored = {doc["metadata"].get("page") for doc in response.json()["documents"]}
+    ok = pages < 2 or len(stored - {None}) > 1
+    return {"ok": ok, "pages_stored": len(stored - {None}), "pages_uploaded": pages}
+
+
+async def benchmark(args) -> Dict:
+    backends = create_app(
+        LatencyModel.parse(args.llm_latency),
+        LatencyModel.parse(args.embedding_latency),
+        LatencyModel.parse(args.brave_latency),
+        embedding_dimension=args.embedding_dimension
+    )
+    backend_server = FakeBackendServer(backends, port=free_port())
+    backend_server.start()
+
+    data_directory = tempfile.mkdtemp(prefix="chatbot-bench-")
+    app_port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env=app_environment(args, backend_server.base_url, data_directory)
+    )
+
+    results: Dict = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "upload_requests": args.upload_requests,
+            "text_bytes": args.text_bytes,
+            "pdf_pages": args.pdf_pages,
+            "sessions": args.sessions,
+            "answer_cache": args.answer_cache,
+            "llm_latency": str(LatencyModel.parse(args.llm_latency)),
+            "embedding_latency": str(LatencyModel.parse(args.embedding_latency)),
+            "brave_latency": str(LatencyModel.parse(args.brave_latency)),
+            "env": args.env,
+        },
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=args.timeout, limits=limits) as client:
+            results["startup"] = {"ready_seconds": round(await wait_until_ready(client, process, args.startup_timeout), 3)}
+            results["startup"].update(read_rss_mb(process.pid))
+
+            senders = scenario_senders(args)
+            for name in args.scenarios:
+                total = args.upload_requests if name.startswith("upload") else args.requests
+                print(f"Running {name}: {total} requests at concurrency {args.concurrency}", file=sys.stderr)
+                scenario = await run_scenario(client, senders[name], total, args.concurrency)
+                scenario.update(read_rss_mb(process.pid))
+                results["scenarios"][name] = scenario
+                if name == "upload_pdf":
+                    results["checks"] = {"pdf_page_metadata": await check_pdf_pages(client, args.pdf_pages)}
+            results["backend_calls"] = dict(backends.state.calls)
+    finally:
+        rss = read_rss_mb(process.pid)
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        backend_server.stop()
+        if not args.keep_data:
+            shutil.rmtree(data_directory, ignore_errors=True)
+
+    # /proc is Linux-only; elsewhere fall back to the children's max RSS (KiB on Linux, bytes on macOS)
+    peak = rss["peak_rss_mb"]
+    if peak is None:
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    results["peak_rss_mb"] = round(peak, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with fake OpenAI, embedding and Brave backends.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}, run in the given order.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per chat / embeddings / web_search scenario.")
+    parser.add_argument("--upload-requests", type=int, default=20, help="Requests per upload scenario.")
+    parser.add_argument("--text-bytes", type=int, default=20_000, help="Size of each generated text document.")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="Pages in each generated PDF.")
+    parser.add_argument("--sessions", type=int, default=16, help="Distinct chat session ids.")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache enabled.")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.5", help="Latency spec, see fake_backends.LatencyModel.")
+    parser.add_argument("--embedding-latency", default="lognormal:40:0.3")
+    parser.add_argument("--brave-latency", default="lognormal:150:0.4")
+    parser.add_argument("--embedding-dimension", type=int, default=1536)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app, e.g. --env HYBRID_RETRIEVAL_ENABLED=false.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "benchmarks", "results"))
+    parser.add_argument("--keep-data", action="store_true", help="Keep the temporary Chroma / session data.")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(benchmark(args))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    commit = (results["git"]["commit"] or "nogit")[:8]
+    path = os.path.join(args.output_dir, f"{stamp}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for name, scenario in results["scenarios"].items():
+        latency = scenario["latency_ms"]
+        print(f"{name:12s} {scenario['throughput_rps']:>8} req/s  p50 {latency['p50']} ms  "
+              f"p95 {latency['p95']} ms  p99 {latency['p99']} ms  errors {sum(scenario['errors'].values())}")
+    print(f"peak RSS {results['peak_rss_mb']} MB; results written to {path}")
+    failed = [name for name, check in results.get("checks", {}).items() if not check["ok"]]
+    if failed:
+        print(f"failed checks: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Check that importing the app stays within a cold-start time budget.
+
+Imports `main` in fresh interpreters, takes the median wall time, and fails if it
+exceeds the budget or if any heavy module (Chroma, the OpenAI/LangChain clients,
+torch) was loaded at import time instead of on first use.
+
+    python benchmarks/startup_budget.py --budget 2.0 --runs 5
+
+Exits with status 1 on a regression. tests/test_startup_budget.py runs the
+same checks under pytest.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported when the RAG chain is first built
+LAZY_MODULES = [
+    "chromadb", "langchain_openai", "langchain.agents", "langchain_community", "torch", "sentence_transformers", "PyPDF2"
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "rag_chain_built": main.rag_chain.ready,
+    "eager_modules": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def measure_once() -> dict:
+    env = dict(os.environ, WARMUP_ON_STARTUP="false")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0")))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    median = statistics.median(sample["seconds"] for sample in samples)
+    eager = sorted({name for sample in samples for name in sample["eager_modules"]})
+    built = any(sample["rag_chain_built"] for sample in samples)
+
+    report = {
+        "runs": args.runs,
+        "median_seconds": round(median, 3),
+        "max_seconds": round(max(sample["seconds"] for sample in samples), 3),
+        "budget_seconds": args.budget,
+        "eager_modules": eager,
+        "rag_chain_built_on_import": built,
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds budget {args.budget:.3f}s")
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if built:
+        failures.append("RAG chain was built at import time")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Deterministic request payloads for the benchmark: text documents, multi-page PDFs and questions."""
+from typing import List
+import random
+
+VOCABULARY = (
+    "pool connection timeout retry cache index vector chunk embedding latency throughput replica "
+    "invoice payment customer contract warranty shipment policy premium renewal clause schedule "
+    "server cluster deployment rollback monitoring alert threshold quota budget forecast report"
+).split()
+
+FILLER = "the a of to and in for on with by from at is are was be this that it as".split()
+
+QUESTIONS = [
+    "hi",
+    "thanks a lot!",
+    "What does the uploaded document say about the connection pool timeout?",
+    "Summarize the invoice payment terms in the contract document.",
+    "What is the latest news about vector databases?",
+    "According to the report, how does the current replica latency compare with today's numbers?",
+    "Explain how retrieval augmented generation works.",
+    "Which warranty clause covers shipment delays?",
+]
+
+
+def paragraph(rng: random.Random, sentences: int = 5) -> str:
+    out = []
+    for _ in range(sentences):
+        words = [rng.choice(VOCABULARY if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(8, 18))]
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+def text_document(seed: int, size_bytes: int) -> bytes:
+    """Unique plain-text document of roughly `size_bytes`."""
+    rng = random.Random(seed)
+    parts = [f"Benchmark document {seed}."]
+    total = len(parts[0])
+    while total < size_bytes:
+        parts.append(paragraph(rng))
+        total += len(parts[-1]) + 2
+    return "\n\n".join(parts).encode("utf-8")
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_document(seed: int, pages: int, lines_per_page: int = 40) -> bytes:
+    """Unique multi-page PDF with extractable Helvetica text, built without extra dependencies."""
+    rng = random.Random(seed)
+    page_streams = []
+    for page in range(pages):
+        lines = [f"Benchmark PDF {seed}, page {page + 1}."]
+        while len(lines) < lines_per_page:
+            lines.append(" ".join(rng.choice(VOCABULARY + FILLER) for _ in range(12)))
+        text_ops = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        page_streams.append(f"BT /F1 10 Tf 12 TL 50 760 Td {text_ops} ET".encode("latin-1"))
+
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("ascii"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, stream in enumerate(page_streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode("ascii")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def question(index: int) -> str:
+    """Cycle through a mix of small talk, document, web and open questions."""
+    return QUESTIONS[index % len(QUESTIONS)]
+
+
+def search_query(index: int) -> str:
+    return f"{VOCABULARY[index % len(VOCABULARY)]} {VOCABULARY[(index * 7) % len(VOCABULARY)]} {index}"
@@ -1,29 +1,81 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 import os
-from PyPDF2 import PdfReader
-import chardet
-import io
+import shutil
+import tempfile
+import asyncio
+import uuid
 import logging
-from langchain_community.chat_models import ChatOpenAI
-from langchain_community.tools import DuckDuckGoSearchRun
-from app.tools.web_search import brave_search, BraveSearchError
-import json
+import re
+from app.config import get_settings
+from app.metrics import REGISTRY, RequestMetricsMiddleware, TraceIdFilter, stage
+
+settings = get_settings()
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging; every line carries the id of the request that produced it
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"
+)
+for handler in logging.getLogger().handlers:
+    handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
-from app.rag_chain import RAGChain
-from app.config import get_settings
+from app.tools.web_search import abrave_search, get_brave_client, BraveSearchError
+from app.streaming import format_sse
+from app.ingest import iter_upload_text, extract_pdf_pages, shutdown_pdf_pool
+from app.errors import QueryTimeoutError
+from app.lazy import LazyComponent
+from app.session_store import SessionLocks, create_session_store
+from app.conversation import ConversationContextBuilder
+from app.jobs import IngestJobQueue
 
-app = FastAPI(title="RAG Chatbot API")
-settings = get_settings()
+def build_rag_chain():
+    # Imported here: langchain, Chroma and the OpenAI clients dominate import time
+    from app.rag_chain import RAGChain
+    return RAGChain()
 
-# Initialize RAG chain
-rag_chain = RAGChain()
+# Built on first use (or by the warm-up task) so the server starts accepting connections right away
+rag_chain = LazyComponent(build_rag_chain, "RAG chain")
+
+# Session histories: SQLite shared by all workers (or per-process JSONL logs), with a bounded in-memory cache.
+# Opened in lifespan, not at import, since opening may migrate session files.
+session_store = LazyComponent(lambda: create_session_store(settings), "session store")
+# Turns of one session run one at a time, so each sees the previous answer
+session_locks = SessionLocks()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await session_store.aget()
+    await ingest_queue.start()
+    warm_up = asyncio.create_task(rag_chain.warm_up()) if settings.warmup_on_startup else None
+    yield
+    if warm_up is not None:
+        await warm_up
+    await ingest_queue.stop()
+    chain = rag_chain.peek()
+    if chain is not None:
+        await run_in_threadpool(chain.vector_store.close)
+    shutdown_pdf_pool()
+    await get_brave_client().aclose()
+    close_sessions = getattr(session_store.peek(), "close", None)
+    if close_sessions is not None:
+        close_sessions()
+
+app = FastAPI(title="RAG Chatbot API", lifespan=lifespan)
+
+# Background ingestion for batch uploads
+ingest_queue = IngestJobQueue(
+    lambda: rag_chain.get().vector_store,
+    workers=settings.ingest_workers,
+    embed_batch_size=settings.ingest_embed_batch_size,
+    embed_concurrency=settings.ingest_embed_concurrency
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -32,8 +84,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-ID"],
 )
 
+# Trace ids, request counts and latencies for /metrics
+app.add_middleware(RequestMetricsMiddleware)
+
 class ChatRequest(BaseModel):
     message: str
     session_id: str 
@@ -46,16 +102,41 @@ class ChatResponse(BaseModel):
 class DocumentResponse(BaseModel):
     message: str
     document_count: int
+    ingest_stats: Optional[Dict[str, int]] = None
+
+class IngestFileStatus(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    status: str
+    chunks: int
+    embedded_chunks: int
+    error: Optional[str] = None
+
+class IngestJobResponse(BaseModel):
+    id: str
+    status: str
+    files: List[IngestFileStatus]
+    stats: Dict[str, int]
+    created_at: float
+    finished_at: Optional[float] = None
 
 class EmbeddingInfo(BaseModel):
     total_documents: int
     documents: List[Dict[str, Any]]
     collection_info: Dict[str, Any]
+    next_offset: Optional[int] = None
 
 class DeleteResponse(BaseModel):
     message: str
     deleted_count: int
 
+class DocumentInfo(BaseModel):
+    document_id: str
+    filename: str
+    chunk_count: int
+    content_hash: Optional[str] = None
+    ingested_at: float
+
 class WebSearchRequest(BaseModel):
     query: str
     num_results: Optional[int] = 3
@@ -68,157 +149,151 @@ class WebSearchResult(BaseModel):
 class WebSearchResponse(BaseModel):
     results: List[WebSearchResult]
 
-# In-memory session store: session_id -> list of messages
-session_store: Dict[str, List[Dict[str, str]]] = {}
-
-SESSIONS_DIR = "sessions"
-os.makedirs(SESSIONS_DIR, exist_ok=True)
-
-# Helper functions for session persistence
-def save_session_to_disk(session_id: str, history: List[Dict[str, str]]):
-    path = os.path.join(SESSIONS_DIR, f"{session_id}.json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
-
-def load_session_from_disk(session_id: str) -> List[Dict[str, str]]:
-    path = os.path.join(SESSIONS_DIR, f"{session_id}.json")
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
-
-def read_file_content(file_path: str) -> str:
-    """Read file content with proper encoding handling."""
-    # Read the file in binary mode
-    with open(file_path, 'rb') as file:
-        raw_data = file.read()
-        
-        # Try to detect the encoding
-        result = chardet.detect(raw_data)
-        detected_encoding = result['encoding']
-        
-        # If no encoding is detected, try common encodings
-        if not detected_encoding:
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']:
-                try:
-                    return raw_data.decode(encoding)
-                except UnicodeDecodeError:
-                    continue
-            raise ValueError("Could not decode the file with any supported encoding")
-        
-        # Try the detected encoding
-        try:
-            return raw_data.decode(detected_encoding)
-        except UnicodeDecodeError:
-            # If detected encoding fails, try common encodings
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']:
-                try:
-                    return raw_data.decode(encoding)
-                except UnicodeDecodeError:
-                    continue
-            raise ValueError("Could not decode the file with any supported encoding")
-
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF content."""
+# Earlier turns are passed to the chain within a token budget, older ones as a rolling summary
+async def summarize_conversation(summary: str, new_lines: str) -> str:
+    return await (await rag_chain.aget()).asummarize(summary, new_lines)
+
+conversation = ConversationContextBuilder(
+    summarize_conversation,
+    token_budget=settings.history_token_budget,
+    model_name=settings.model_name
+)
+
+async def extract_pdf_pages_from_upload(file: UploadFile):
+    """Copy a PDF upload to a temporary file so worker processes can read its pages."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp_path = tmp.name
+        await run_in_threadpool(shutil.copyfileobj, file.file, tmp)
     try:
-        # Create a BytesIO object from the file content
-        pdf_file = io.BytesIO(file_content)
-        
-        # Create PDF reader object
-        pdf_reader = PdfReader(pdf_file)
-        
-        # Extract text from each page
-        text_content = []
-        for page in pdf_reader.pages:
-            try:
-                text = page.extract_text()
-                if text:  # Only add non-empty text
-                    text_content.append(text)
-            except Exception as e:
-                logger.error(f"Error extracting text from page: {str(e)}")
-                continue
-        
-        if not text_content:
-            raise ValueError("No text could be extracted from the PDF")
-            
-        return "\n".join(text_content)
-    except Exception as e:
-        raise ValueError(f"Error processing PDF: {str(e)}")
+        return await extract_pdf_pages(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+def extract_answer_metadata(response: str):
+    """Pull the source url and document name out of an agent answer."""
+    url = None
+    document_name = None
+
+    url_match = re.search(r'(https?://\S+)', response)
+    if url_match:
+        url = url_match.group(1)
+
+    if "Document:" in response:
+        document_name = response.split("Document:")[1].strip()
+
+    return url, document_name
+
+async def build_conversation_context(session_id: str):
+    """Prompt history for the session, storing a refreshed summary if one was produced."""
+    store = await session_store.aget()
+    with stage("conversation_context"):
+        context = await conversation.build(await run_in_threadpool(store.get, session_id))
+    if context.summary_record is not None:
+        await run_in_threadpool(store.append, session_id, context.summary_record)
+    return context
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Chat endpoint that processes user messages and returns AI responses."""
     try:
-        # Retrieve or create session history (load from disk if not in memory)
-        history = session_store.get(request.session_id)
-        if history is None:
-            history = load_session_from_disk(request.session_id)
-            session_store[request.session_id] = history
-        # Append user message to history
-        history.append({"role": "user", "content": request.message})
-        # Optionally, pass history to RAGChain (if supported)
-        # For now, just use the latest message as before
-        response = rag_chain.query(request.message)
-        url = None
-        document_name = None
-        
-        import re
-        url_match = re.search(r'(https?://\S+)', response)
-        if url_match:
-            url = url_match.group(1)
-            
-        if "Document:" in response:
-            document_name = response.split("Document:")[1].strip()
-
-        history.append({"role": "assistant", "content": response, "url": url, "document_name": document_name})
-        # Save updated session to disk
-        save_session_to_disk(request.session_id, history)
+        user_message = {"role": "user", "content": request.message}
+        chain = await rag_chain.aget()
+        async with session_locks.hold(request.session_id):
+            context = await build_conversation_context(request.session_id)
+            response = await chain.aquery(request.message, context)
+            url, document_name = extract_answer_metadata(response)
+
+            # Append the turn to the session log
+            with stage("session_append"):
+                await run_in_threadpool(
+                    (await session_store.aget()).append,
+                    request.session_id,
+                    user_message,
+                    {"role": "assistant", "content": response, "url": url, "document_name": document_name}
+                )
         return ChatResponse(response=response, url=url, document_name=document_name)
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint that emits agent steps and answer tokens as Server-Sent Events.
+
+    Events: "step" and "observation" while tools run, "token" for each piece of
+    the final answer, then a trailing "done" event carrying the full response,
+    url and document_name (or "error" if the agent failed).
+    """
+    async def event_stream():
+        messages = [{"role": "user", "content": request.message}]
+        async with session_locks.hold(request.session_id):
+            try:
+                response = None
+                chain = await rag_chain.aget()
+                context = await build_conversation_context(request.session_id)
+                async for event, data in chain.astream(request.message, context):
+                    if event == "answer":
+                        response = data["response"]
+                        continue
+                    yield format_sse(event, data)
+
+                url, document_name = extract_answer_metadata(response)
+                messages.append({"role": "assistant", "content": response, "url": url, "document_name": document_name})
+                yield format_sse("done", {"response": response, "url": url, "document_name": document_name})
+            except Exception as e:
+                logger.error(f"Error streaming chat response: {str(e)}")
+                yield format_sse("error", {"detail": str(e)})
+            finally:
+                with stage("session_append"):
+                    # Appends may fsync or wait for the SQLite write lock; keep them off the event loop
+                    await run_in_threadpool((await session_store.aget()).append, request.session_id, *messages)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def ingest_upload(file: UploadFile, durable: bool, update: bool = False) -> Dict[str, int]:
+    """Extract, split and embed a single uploaded file.
+
+    With `update`, only chunks that changed since the stored version of the
+    same filename are embedded and chunks that disappeared are deleted.
+    """
+    chain = await rag_chain.aget()
+    metadata = {
+        "filename": file.filename,
+        "content_type": file.content_type
+    }
+
+    # Process the document based on file type
+    if file.filename.lower().endswith('.pdf'):
+        # Handle PDF files: extract pages in parallel and keep page numbers in chunk metadata
+        pages = await extract_pdf_pages_from_upload(file)
+        return await run_in_threadpool(
+            chain.add_documents,
+            [text for _, text in pages],
+            [{**metadata, "page": page_number} for page_number, _ in pages],
+            durable,
+            update
+        )
+    # Handle text files: decode, split and embed as the upload is read
+    return await chain.aadd_text_stream(iter_upload_text(file), metadata, wait=durable, update=update)
+
 @app.post("/upload", response_model=DocumentResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    durable: bool = Query(True, description="Wait until the chunks are committed to the vector store before responding."),
+    mode: str = Query("add", pattern="^(add|update)$", description="'update' re-embeds only the chunks that changed since the stored version of this filename.")
+):
     """Upload and process a document."""
     try:
-        # Read the file content
-        content = await file.read()
-        
-        # Process the document based on file type
-        if file.filename.lower().endswith('.pdf'):
-            # Handle PDF files
-            text_content = extract_text_from_pdf(content)
-        else:
-            # Handle text files
-            # Save temporarily to process with encoding detection
-            os.makedirs("uploads", exist_ok=True)
-            temp_path = f"uploads/{file.filename}"
-            try:
-                with open(temp_path, "wb") as f:
-                    f.write(content)
-                text_content = read_file_content(temp_path)
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-        
-        logger.debug(f"Extracted text type: {type(text_content)}")
-        logger.debug(f"Extracted text length: {len(text_content)}")
-        
-        # Add the content to the RAG chain with metadata
-        metadata = {
-            "filename": file.filename,
-            "content_type": file.content_type
-        }
-        
-        # Ensure text_content is a string
-        if not isinstance(text_content, str):
-            raise ValueError(f"Expected string content, got {type(text_content)}")
-            
-        rag_chain.add_documents(text_content, metadata)
-        
+        ingest_stats = await ingest_upload(file, durable, update=mode == "update")
         return DocumentResponse(
             message="Document processed successfully",
-            document_count=1
+            document_count=1,
+            ingest_stats=ingest_stats
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -226,37 +301,81 @@ async def upload_document(file: UploadFile = File(...)):
         logger.error(f"Error processing document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/upload/batch", response_model=IngestJobResponse, status_code=202)
+async def upload_documents_batch(files: List[UploadFile] = File(...)):
+    """Queue several documents for background ingestion and return the job right away."""
+    try:
+        job_directory = os.path.join(settings.uploads_directory, uuid.uuid4().hex)
+        os.makedirs(job_directory, exist_ok=True)
+        spooled = []
+        for index, file in enumerate(files):
+            filename = os.path.basename(file.filename or f"upload-{index}")
+            path = os.path.join(job_directory, f"{index}_{filename}")
+            with open(path, "wb") as f:
+                await run_in_threadpool(shutil.copyfileobj, file.file, f)
+            spooled.append((path, filename, file.content_type))
+
+        job = ingest_queue.submit(spooled, cleanup_directory=job_directory)
+        return IngestJobResponse(**job.to_dict())
+    except Exception as e:
+        logger.error(f"Error queueing documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    """Report the progress of a background ingestion job."""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return IngestJobResponse(**job.to_dict())
+
+EMBEDDING_INCLUDE_FIELDS = {"documents", "metadatas", "embeddings"}
+
 @app.get("/embeddings", response_model=EmbeddingInfo)
-async def get_embeddings():
-    """Get information about stored embeddings and documents."""
+async def get_embeddings(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of chunks to return."),
+    offset: int = Query(0, ge=0, description="Number of chunks to skip; pass the previous next_offset to continue."),
+    include: List[str] = Query(["documents", "metadatas"], description="Fields to load: documents, metadatas, embeddings."),
+    filename: Optional[str] = Query(None, description="Only return chunks of this document."),
+    summary: bool = Query(False, description="Only return counts and dimensions, without listing chunks.")
+):
+    """Get information about stored embeddings and documents, one page at a time."""
+    unknown = set(include) - EMBEDDING_INCLUDE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include fields: {sorted(unknown)}")
     try:
-        # Get the collection from the vector store
-        collection = rag_chain.vector_store.vector_store._collection
-        
-        # Get all documents from the collection
-        results = collection.get()
+        vector_store = (await rag_chain.aget()).vector_store
+        where = {"filename": filename} if filename else None
+
+        # Get collection information
+        collection_info = await run_in_threadpool(vector_store.summary)
+        total = collection_info["count"] if where is None else await run_in_threadpool(vector_store.count, where)
+        if summary:
+            return EmbeddingInfo(total_documents=total, documents=[], collection_info=collection_info)
+
+        results = await run_in_threadpool(vector_store.get_chunks, limit, offset, where, tuple(include))
         
         # Prepare document information
         documents = []
-        for i, (text, metadata) in enumerate(zip(results['documents'], results['metadatas'])):
-            documents.append({
-                "id": results['ids'][i],
-                "text": text[:200] + "..." if len(text) > 200 else text,  # Truncate long texts
-                "metadata": metadata,
-                "embedding_dimension": len(results['embeddings'][i]) if results['embeddings'] else None
-            })
-        
-        # Get collection information
-        collection_info = {
-            "name": collection.name,
-            "count": collection.count(),
-            "embedding_dimension": len(results['embeddings'][0]) if results['embeddings'] else None
-        }
+        for i, chunk_id in enumerate(results['ids']):
+            document = {"id": chunk_id}
+            if "documents" in include:
+                text = results['documents'][i]
+                document["text"] = text[:200] + "..." if len(text) > 200 else text  # Truncate long texts
+            if "metadatas" in include:
+                document["metadata"] = results['metadatas'][i]
+            if "embeddings" in include:
+                embedding = results['embeddings'][i]
+                document["embedding"] = [float(value) for value in embedding]
+                document["embedding_dimension"] = len(embedding)
+            documents.append(document)
         
+        next_offset = offset + len(documents)
         return EmbeddingInfo(
-            total_documents=len(documents),
+            total_documents=total,
             documents=documents,
-            collection_info=collection_info
+            collection_info=collection_info,
+            next_offset=next_offset if next_offset < total else None
         )
     except Exception as e:
         logger.error(f"Error retrieving embeddings: {str(e)}")
@@ -264,26 +383,21 @@ async def get_embeddings():
 
 @app.delete("/embeddings", response_model=DeleteResponse)
 async def delete_embeddings(
-    document_ids: Optional[List[str]] = Query(None, description="List of document IDs to delete. If not provided, all documents will be deleted.")
+    document_ids: Optional[List[str]] = Query(None, description="List of document IDs to delete. If not provided, all documents will be deleted."),
+    durable: bool = Query(True, description="Wait until the delete is committed before responding.")
 ):
     """Delete embeddings from the vector store."""
     try:
-        collection = rag_chain.vector_store.vector_store._collection
-        
+        vector_store = (await rag_chain.aget()).vector_store
         if document_ids:
             # Delete specific documents
-            collection.delete(ids=document_ids)
-            deleted_count = len(document_ids)
+            deleted_count = await run_in_threadpool(vector_store.delete, document_ids, durable)
             message = f"Successfully deleted {deleted_count} documents"
         else:
             # Delete all documents
-            collection.delete(where={})
-            deleted_count = collection.count()
+            deleted_count = await run_in_threadpool(vector_store.truncate)
             message = "Successfully cleared all documents from the vector store"
         
-        # Persist changes
-        rag_chain.vector_store.vector_store.persist()
-        
         return DeleteResponse(
             message=message,
             deleted_count=deleted_count
@@ -292,17 +406,98 @@ async def delete_embeddings(
         logger.error(f"Error deleting embeddings: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/documents", response_model=List[DocumentInfo])
+async def list_documents():
+    """List ingested documents with their chunk counts, content hash and ingest time."""
+    vector_store = (await rag_chain.aget()).vector_store
+    return [DocumentInfo(**record.to_dict()) for record in vector_store.list_documents()]
+
+@app.delete("/documents/{document_id}", response_model=DeleteResponse)
+async def delete_document(
+    document_id: str,
+    durable: bool = Query(True, description="Wait until the delete is committed before responding.")
+):
+    """Delete every chunk of one document in a single bulk operation."""
+    try:
+        vector_store = (await rag_chain.aget()).vector_store
+        deleted_count = await run_in_threadpool(vector_store.delete_document, document_id, durable)
+    except Exception as e:
+        logger.error(f"Error deleting document: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if deleted_count is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document {document_id}")
+    return DeleteResponse(
+        message=f"Successfully deleted document {document_id}",
+        deleted_count=deleted_count
+    )
+
+@app.put("/documents", response_model=DocumentResponse)
+async def replace_document(
+    file: UploadFile = File(...),
+    durable: bool = Query(True, description="Wait until the chunks are committed to the vector store before responding.")
+):
+    """Replace the stored document with the same filename by the uploaded version.
+
+    Unchanged chunks are kept, removed ones are deleted and only new ones are embedded.
+    """
+    try:
+        record = (await rag_chain.aget()).vector_store.registry.find_by_filename(file.filename)
+        ingest_stats = await ingest_upload(file, durable, update=True)
+        return DocumentResponse(
+            message="Document replaced successfully" if record is not None else "Document processed successfully",
+            document_count=1,
+            ingest_stats=ingest_stats
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error replacing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/embeddings/write_stats")
+async def get_write_stats():
+    """Group-commit statistics for vector store writes: commit counts, batch sizes and latency."""
+    return (await rag_chain.aget()).vector_store.write_stats()
+
+@app.get("/chat/route_stats")
+async def get_route_stats():
+    """Latency percentiles per query route (smalltalk, documents, web, hybrid, agent) over recent requests."""
+    return (await rag_chain.aget()).route_stats.snapshot()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and per-stage latency histograms, LLM and embedding token counts, cache hit ratios."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once the RAG chain is built, 503 while it is still starting (or failed to)."""
+    if rag_chain.ready:
+        return {"status": "ready", "init_seconds": round(rag_chain.build_seconds, 3)}
+    body = {"status": "starting"}
+    if rag_chain.error is not None:
+        body = {"status": "error", "detail": str(rag_chain.error)}
+    return JSONResponse(status_code=503, content=body)
+
 @app.post("/web_search", response_model=WebSearchResponse)
 async def web_search_endpoint(request: WebSearchRequest):
     """Perform a web search using Brave Search API."""
     try:
-        results = brave_search(request.query, request.num_results)
+        results = await asyncio.wait_for(
+            abrave_search(request.query, request.num_results),
+            timeout=settings.request_timeout_seconds
+        )
         return WebSearchResponse(results=[WebSearchResult(**r) for r in results])
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Web search did not finish within {settings.request_timeout_seconds} seconds"
+        )
     except BraveSearchError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
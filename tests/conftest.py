@@ -0,0 +1,34 @@
+import pytest
+
+from app.config import get_settings
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """App settings pointed at throwaway directories."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "openai_api_key", "test")
+    monkeypatch.setattr(settings, "chroma_persist_directory", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "embedding_cache_directory", str(tmp_path / "embedding_cache"))
+    monkeypatch.setattr(settings, "vector_index_directory", str(tmp_path / "vector_index"))
+    monkeypatch.setattr(settings, "vector_write_max_delay_ms", 1.0)
+    return settings
+
+
+@pytest.fixture
+def make_vector_store(settings):
+    """Build VectorStores on the test settings, embedding with LangChain's deterministic fake embeddings."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.vector_store import VectorStore
+
+    stores = []
+
+    def make():
+        store = VectorStore()
+        store.embeddings.underlying = DeterministicFakeEmbedding(size=16)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
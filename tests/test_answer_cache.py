@@ -0,0 +1,82 @@
+import asyncio
+
+from app.answer_cache import AnswerCache, SingleFlight
+from app.document_registry import DocumentRegistry
+
+
+def make_cache(**kwargs) -> AnswerCache:
+    options = dict(max_entries=8, ttl_seconds=60, similarity_threshold=0.9)
+    options.update(kwargs)
+    return AnswerCache(**options)
+
+
+def test_exact_match_ignores_case_whitespace_and_punctuation():
+    cache = make_cache()
+    cache.put("What is RAG?", None, "retrieval", cache.generation)
+    assert cache.get("  what is   rag ") == "retrieval"
+    assert cache.get("what is bm25") is None
+
+
+def test_near_duplicate_match_uses_similarity_threshold():
+    cache = make_cache()
+    cache.put("q1", [1.0, 0.0], "a1", cache.generation)
+    assert cache.get_similar([0.99, 0.05]) == "a1"
+    assert cache.get_similar([0.5, 0.5]) is None
+
+
+def test_expired_entries_are_dropped():
+    cache = make_cache(ttl_seconds=-1)
+    cache.put("q", [1.0, 0.0], "a", cache.generation)
+    assert cache.get("q") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.put("a", None, "1", cache.generation)
+    cache.put("b", None, "2", cache.generation)
+    cache.get("a")
+    cache.put("c", None, "3", cache.generation)
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_answers_computed_before_an_invalidation_are_not_stored():
+    cache = make_cache()
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("q", None, "stale", generation)
+    assert cache.get("q") is None
+
+
+def test_change_in_another_worker_invalidates(tmp_path):
+    path = str(tmp_path / "documents.db")
+    mine, theirs = DocumentRegistry(path), DocumentRegistry(path)
+    cache = make_cache(shared_generation=mine.generation)
+    cache.put("q", None, "a", cache.generation)
+    assert cache.get("q") == "a"
+
+    generation = cache.generation
+    theirs.bump_generation()
+    assert cache.get("q") is None
+    cache.put("q", None, "stale", generation)
+    assert cache.get("q") is None
+    cache.put("q", None, "fresh", cache.generation)
+    assert cache.get("q") == "fresh"
+
+
+def test_single_flight_shares_one_execution():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["answer"] * 5
+    assert calls == 1
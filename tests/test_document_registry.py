@@ -0,0 +1,56 @@
+import json
+
+from app.document_registry import DocumentRecord, DocumentRegistry, document_id_for
+
+
+def test_record_get_and_list(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    registry.record_chunks("a.txt", ["a1", "a2"], content_hash="h")
+    registry.record_chunks("a.txt", ["a2", "a3"])
+    registry.record_chunks("b.txt", ["b1"])
+
+    record = registry.find_by_filename("a.txt")
+    assert record.chunk_ids == ["a1", "a2", "a3"]
+    assert record.content_hash == "h"
+    assert {r.filename: r.to_dict()["chunk_count"] for r in registry.list()} == {"a.txt": 3, "b.txt": 1}
+    assert all(r.chunk_ids == [] for r in registry.list())
+    assert registry.get("missing") is None
+
+
+def test_documents_without_chunks_are_listed_with_zero(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    registry.record_chunks("empty.txt", [], content_hash="h")
+    assert [r.to_dict()["chunk_count"] for r in registry.list()] == [0]
+
+
+def test_remove_chunk_ids_drops_emptied_documents(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    registry.record_chunks("a.txt", ["a1", "a2"])
+    registry.record_chunks("b.txt", ["b1"])
+    registry.remove_chunk_ids(["a1", "b1", "unknown"])
+    assert registry.find_by_filename("a.txt").chunk_ids == ["a2"]
+    assert registry.find_by_filename("b.txt") is None
+    assert registry.remove(document_id_for("a.txt")).chunk_ids == ["a2"]
+    assert registry.list() == []
+
+
+def test_workers_sharing_the_file_agree(tmp_path):
+    path = str(tmp_path / "documents.db")
+    first, second = DocumentRegistry(path), DocumentRegistry(path)
+    first.record_chunks("a.txt", ["a1"])
+    assert second.find_by_filename("a.txt").chunk_ids == ["a1"]
+    generation = first.generation()
+    second.bump_generation()
+    assert first.generation() == generation + 1
+    second.clear()
+    assert first.list() == []
+
+
+def test_legacy_json_is_imported(tmp_path):
+    legacy = tmp_path / "documents.json"
+    record = DocumentRecord(document_id=document_id_for("a.txt"), filename="a.txt", chunk_ids=["a1"], content_hash="h")
+    legacy.write_text(json.dumps([{k: v for k, v in record.__dict__.items() if k != "chunk_count"}]))
+    registry = DocumentRegistry(str(tmp_path / "documents.db"), legacy_path=str(legacy))
+    assert registry.exists_on_disk
+    assert registry.find_by_filename("a.txt").chunk_ids == ["a1"]
+    assert not legacy.exists() and (tmp_path / "documents.json.migrated").exists()
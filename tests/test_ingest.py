@@ -0,0 +1,58 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.ingest import ENCODING_SNIFF_BYTES, UPLOAD_READ_SIZE, encoding_candidates, iter_upload_text, read_text_file
+
+ACCENTED = "Café naïve résumé über"
+
+
+def decode_upload(data: bytes) -> str:
+    async def collect():
+        upload = UploadFile(io.BytesIO(data), filename="upload.txt")
+        return "".join([text async for text in iter_upload_text(upload)])
+
+    return asyncio.run(collect())
+
+
+def test_ascii_detection_is_read_as_utf8():
+    assert encoding_candidates(b"plain", {"encoding": "ascii", "confidence": 1.0})[0] == "utf-8"
+    assert encoding_candidates(b"plain", {"encoding": None, "confidence": 0.0})[0] == "utf-8"
+
+
+def test_candidates_skip_encodings_that_cannot_decode_the_prefix():
+    candidates = encoding_candidates("é!".encode("latin-1"), {"encoding": "Windows-1253", "confidence": 0.05})
+    assert candidates[0] == "iso8859-1"
+    assert "utf-8" not in candidates and "cp1253" not in candidates
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp1252"])
+def test_non_ascii_after_an_ascii_prefix_is_decoded(tmp_path, encoding):
+    text = "a" * (2 * ENCODING_SNIFF_BYTES) + ACCENTED
+    data = text.encode(encoding)
+    assert decode_upload(data) == text
+    path = tmp_path / "file.txt"
+    path.write_bytes(data)
+    assert read_text_file(str(path)) == text
+
+
+def test_multibyte_character_across_read_boundary():
+    text = "a" * (UPLOAD_READ_SIZE - 1) + "€" + ACCENTED
+    assert decode_upload(text.encode("utf-8")) == text
+
+
+def test_latin1_upload_with_non_ascii_prefix():
+    text = ACCENTED * 10
+    assert decode_upload(text.encode("latin-1")) == text
+
+
+def test_mixed_encodings_are_rejected_instead_of_replaced():
+    data = ("é" + "a" * (2 * ENCODING_SNIFF_BYTES)).encode("utf-8") + "é".encode("latin-1")
+    with pytest.raises(ValueError):
+        decode_upload(data)
+
+
+def test_empty_upload():
+    assert decode_upload(b"") == ""
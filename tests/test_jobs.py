@@ -0,0 +1,51 @@
+import asyncio
+
+from app.jobs import IngestJobQueue
+
+
+class FailingEmbeddings:
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding API unavailable")
+
+
+def run_job(store, tmp_path, files):
+    async def run():
+        queue = IngestJobQueue(lambda: store, workers=1, embed_batch_size=4)
+        await queue.start()
+        try:
+            paths = []
+            for name, text in files.items():
+                path = tmp_path / name
+                path.write_text(text, encoding="utf-8")
+                paths.append((str(path), name, "text/plain"))
+            job = queue.submit(paths)
+            await queue._queue.join()
+            return job
+        finally:
+            await queue.stop()
+
+    return asyncio.run(run())
+
+
+def test_job_ingests_files_and_records_their_hashes(make_vector_store, tmp_path):
+    store = make_vector_store()
+    job = run_job(store, tmp_path, {"a.txt": "alpha beta", "b.txt": "gamma delta"})
+    assert job.status == "completed"
+    assert [file.status for file in job.files] == ["persisted", "persisted"]
+    assert all(store.registry.find_by_filename(name).content_hash for name in ("a.txt", "b.txt"))
+    assert store.count() == 2
+
+
+def test_failed_embedding_registers_no_document(make_vector_store, tmp_path):
+    store = make_vector_store()
+    working = store.embeddings.underlying
+    store.embeddings.underlying = FailingEmbeddings()
+    job = run_job(store, tmp_path, {"a.txt": "alpha beta"})
+    assert job.status == "failed"
+    assert job.files[0].status == "failed"
+    assert store.registry.find_by_filename("a.txt") is None
+
+    store.embeddings.underlying = working
+    job = run_job(store, tmp_path, {"a.txt": "alpha beta"})
+    assert job.status == "completed"
+    assert store.registry.find_by_filename("a.txt").content_hash
@@ -0,0 +1,69 @@
+import os
+
+from app.lexical_index import BM25Index, tokenize
+
+
+def test_tokenize_lowercases_unicode_words():
+    assert tokenize("Café, BM25-index!") == ["café", "bm25", "index"]
+
+
+def test_search_ranks_by_bm25(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.json"))
+    index.add([("a", "apple banana"), ("b", "apple apple apple"), ("c", "cherry")])
+    assert [chunk_id for chunk_id, _ in index.search("apple", 5)] == ["b", "a"]
+    assert index.search("durian", 5) == []
+    assert len(index.search("apple cherry", 1)) == 1
+
+
+def test_add_replaces_and_remove_forgets(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.json"))
+    index.add([("a", "apple")])
+    index.add([("a", "banana")])
+    assert index.search("apple", 5) == []
+    index.remove(["a", "unknown"])
+    assert index.search("banana", 5) == [] and len(index) == 0
+
+
+def test_saved_changes_survive_a_reload(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    index = BM25Index(path)
+    index.add([("a", "apple"), ("b", "banana")])
+    index.save()
+    index.remove(["b"])
+    index.save()
+    assert not os.path.exists(path) and os.path.getsize(path + ".log") > 0
+
+    reloaded = BM25Index(path)
+    assert [chunk_id for chunk_id, _ in reloaded.search("apple banana", 5)] == ["a"]
+
+
+def test_log_is_folded_into_the_snapshot_once_it_outgrows_it(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    index = BM25Index(path, min_snapshot_log_bytes=0)
+    index.add([("a", "apple")])
+    index.save()
+    assert os.path.exists(path) and os.path.getsize(path + ".log") == 0
+    index.add([("b", "banana")])
+    index.snapshot()
+    assert os.path.getsize(path + ".log") == 0
+    assert len(BM25Index(path)) == 2
+
+
+def test_search_follows_writes_from_another_instance(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    mine, theirs = BM25Index(path), BM25Index(path)
+    mine.add([("local", "cherry")])
+
+    theirs.add([("a", "apple")])
+    theirs.save()
+    assert [chunk_id for chunk_id, _ in mine.search("apple", 5)] == ["a"]
+    # Unsaved local changes stay on top of what the other instance wrote
+    assert [chunk_id for chunk_id, _ in mine.search("cherry", 5)] == ["local"]
+
+    theirs.clear()
+    theirs.snapshot()
+    assert mine.search("apple", 5) == []
+    assert [chunk_id for chunk_id, _ in mine.search("cherry", 5)] == ["local"]
+
+    mine.save()
+    assert [chunk_id for chunk_id, _ in theirs.search("cherry", 5)] == ["local"]
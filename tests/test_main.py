@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def test_web_search_times_out_with_504(monkeypatch):
+    async def slow_search(query, num_results):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(main, "abrave_search", slow_search)
+    monkeypatch.setattr(main.settings, "request_timeout_seconds", 0.05)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(main.web_search_endpoint(main.WebSearchRequest(query="q", num_results=1)))
+    assert raised.value.status_code == 504
+
+
+def test_web_search_returns_results(monkeypatch):
+    async def search(query, num_results):
+        return [{"title": "t", "url": "https://example.com", "snippet": "d"}]
+
+    monkeypatch.setattr(main, "abrave_search", search)
+    response = asyncio.run(main.web_search_endpoint(main.WebSearchRequest(query="q", num_results=1)))
+    assert response.results[0].url == "https://example.com"
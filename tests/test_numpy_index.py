@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app.numpy_index import NumpyCollection, matches, migrate_from_chroma, quantize
+
+
+def make_collection(tmp_path, **kwargs) -> NumpyCollection:
+    return NumpyCollection(str(tmp_path / "index"), "test", **kwargs)
+
+
+def add_rows(collection):
+    collection.upsert(
+        ids=["x", "y", "xy"],
+        embeddings=[[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+        documents=["doc x", "doc y", "doc xy"],
+        metadatas=[{"page": 1}, {"page": 2}, {"page": 3}]
+    )
+
+
+def test_matches_supports_chroma_operators():
+    metadata = {"filename": "a.pdf", "page": 3}
+    assert matches(metadata, None)
+    assert matches(metadata, {"filename": "a.pdf", "page": {"$gte": 2}})
+    assert matches(metadata, {"$or": [{"page": 1}, {"filename": {"$in": ["a.pdf"]}}]})
+    assert not matches(metadata, {"$and": [{"page": {"$lt": 3}}, {"filename": "a.pdf"}]})
+    assert not matches(metadata, {"missing": {"$gt": 0}})
+    with pytest.raises(ValueError):
+        matches(metadata, {"page": {"$regex": "3"}})
+
+
+def test_quantize_round_trips_within_one_step():
+    vectors = np.array([[0.5, -1.0, 0.25], [0.0, 0.0, 0.0]], dtype=np.float32)
+    codes, scales = quantize(vectors)
+    assert codes.dtype == np.int8 and codes[0, 1] == -127
+    np.testing.assert_allclose(codes * scales[:, None], vectors, atol=scales.max())
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_query_returns_nearest_rows_by_cosine_distance(tmp_path, dtype):
+    collection = make_collection(tmp_path, dtype=dtype)
+    add_rows(collection)
+    result = collection.query(query_embeddings=[[1.0, 0.1]], n_results=2)
+    assert result["ids"] == [["x", "xy"]]
+    assert result["documents"] == [["doc x", "doc xy"]]
+    assert result["distances"][0][0] == pytest.approx(1 - 1 / np.hypot(1.0, 0.1), abs=0.01)
+
+    filtered = collection.query(query_embeddings=[[1.0, 0.1]], n_results=5, where={"page": {"$gte": 2}})
+    assert filtered["ids"] == [["xy", "y"]]
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path):
+    collection = make_collection(tmp_path)
+    add_rows(collection)
+    collection.upsert(ids=["x", "x"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["old", "new"])
+    assert collection.count() == 3
+    assert collection.get(ids=["x"])["documents"] == ["new"]
+
+    collection.delete(ids=["y"])
+    collection.delete(where={"page": 3})
+    assert collection.get()["ids"] == ["x"]
+    with pytest.raises(ValueError):
+        collection.upsert(ids=["z"], embeddings=[[1.0, 0.0, 0.0]])
+
+
+def test_compaction_keeps_live_rows(tmp_path):
+    collection = make_collection(tmp_path, dtype="int8")
+    add_rows(collection)
+    collection.delete(ids=["y"])
+    collection.compact()
+    assert collection.get()["ids"] == ["x", "xy"]
+    assert collection.query(query_embeddings=[[0.0, 1.0]], n_results=1)["ids"] == [["xy"]]
+
+
+def test_other_instances_see_writes_and_drops(tmp_path):
+    mine, theirs = make_collection(tmp_path), make_collection(tmp_path)
+    add_rows(theirs)
+    assert mine.count() == 3
+    theirs.drop()
+    assert mine.count() == 0
+    mine.upsert(ids=["z"], embeddings=[[1.0, 0.0, 0.0]], documents=["three dimensions"])
+    assert theirs.get()["documents"] == ["three dimensions"]
+
+
+def test_migrate_from_chroma_copies_rows_and_metadata(tmp_path):
+    source = make_collection(tmp_path / "source")
+    add_rows(source)
+    source.modify(metadata={"embedding_model": "m", "hnsw:space": "cosine"})
+    target = make_collection(tmp_path / "target")
+    assert migrate_from_chroma(source, target, batch_size=2) == 3
+    assert target.get()["ids"] == ["x", "y", "xy"]
+    assert target.metadata == {"embedding_model": "m"}
@@ -0,0 +1,40 @@
+import pytest
+
+from app.query_router import AGENT, DOCUMENTS, HYBRID, SMALLTALK, WEB, QueryRouter, RouteLatencyStats
+
+
+def make_router(score: float = 0.0) -> QueryRouter:
+    return QueryRouter(lambda question, k: [("chunk", score)] if score else [], document_min_score=5.0)
+
+
+@pytest.mark.parametrize("question, score, route", [
+    ("Hello there!", 0.0, SMALLTALK),
+    ("thanks so much", 0.0, SMALLTALK),
+    ("hello, what does the contract say about termination and notice periods?", 0.0, AGENT),
+    ("What does the uploaded report conclude?", 0.0, DOCUMENTS),
+    ("How is the warranty handled?", 7.5, DOCUMENTS),
+    ("How is the warranty handled?", 2.0, AGENT),
+    ("What is the weather in Paris today?", 0.0, WEB),
+    ("Is the price in the pdf still the current price?", 0.0, HYBRID),
+    ("Explain the difference between TCP and UDP", 0.0, AGENT),
+])
+def test_route(question, score, route):
+    assert make_router(score).route(question) == route
+
+
+def test_smalltalk_skips_the_lexical_lookup():
+    def lexical_search(question, k):
+        raise AssertionError("small talk should not search the index")
+
+    assert QueryRouter(lexical_search).route("hi") == SMALLTALK
+
+
+def test_latency_stats_report_percentiles_per_route():
+    stats = RouteLatencyStats(window=3)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        stats.record(WEB, seconds)
+    snapshot = stats.snapshot()
+    assert snapshot[AGENT] == {"count": 0}
+    assert snapshot[WEB]["count"] == 4
+    assert snapshot[WEB]["p50_ms"] == 300.0
+    assert snapshot[WEB]["mean_ms"] == 300.0
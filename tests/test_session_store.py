@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.session_store import SessionLocks, SessionStore, SqliteSessionStore, create_session_store
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    else:
+        store = SessionStore(str(tmp_path / "sessions"))
+    yield store
+    if hasattr(store, "close"):
+        store.close()
+
+
+def run_threads(target, count):
+    errors = []
+
+    def wrapped(i):
+        try:
+            target(i)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=wrapped, args=(i,), daemon=True) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads), "session store calls did not finish"
+    assert not errors, errors
+
+
+def test_append_and_get_round_trip(store):
+    assert store.get("s1") == []
+    store.append("s1", {"role": "user", "content": "Café"}, {"role": "assistant", "content": "hi"})
+    store.append("s1", {"role": "user", "content": "again"})
+    assert [m["content"] for m in store.get("s1")] == ["Café", "hi", "again"]
+    assert store.get("s2") == []
+
+
+def test_get_returns_a_copy(store):
+    store.append("s1", {"role": "user", "content": "a"})
+    store.get("s1").append({"role": "user", "content": "not stored"})
+    assert len(store.get("s1")) == 1
+
+
+def test_get_and_append_from_many_threads(store):
+    def turn(i):
+        session_id = f"s{i % 4}"
+        store.get(session_id)
+        store.append(session_id, {"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"})
+        store.get(session_id)
+
+    run_threads(turn, 16)
+    for n in range(4):
+        messages = store.get(f"s{n}")
+        assert len(messages) == 8
+        # Each turn's two messages stay adjacent
+        for question, answer in zip(messages[::2], messages[1::2]):
+            assert question["content"][1:] == answer["content"][1:]
+
+
+def test_sqlite_get_sees_other_instances_appends(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SqliteSessionStore(path), SqliteSessionStore(path)
+    try:
+        first.append("s1", {"role": "user", "content": "a"})
+        assert len(second.get("s1")) == 1
+        first.append("s1", {"role": "assistant", "content": "b"})
+        assert [m["content"] for m in second.get("s1")] == ["a", "b"]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_sqlite_cache_evicts_to_max_sessions(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2)
+    try:
+        for n in range(5):
+            store.append(f"s{n}", {"role": "user", "content": str(n)})
+            store.get(f"s{n}")
+        assert len(store._cache) == 2
+        assert store.get("s0")[0]["content"] == "0"
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_sqlite_migrates_session_files_only_when_enabled(settings, tmp_path, monkeypatch, enabled):
+    directory = tmp_path / "sessions"
+    directory.mkdir()
+    (directory / "s1.json").write_text('[{"role": "user", "content": "old"}]')
+    monkeypatch.setattr(settings, "session_backend", "sqlite")
+    monkeypatch.setattr(settings, "sessions_directory", str(directory))
+    monkeypatch.setattr(settings, "session_database_path", "")
+    monkeypatch.setattr(settings, "session_migrate_files", enabled)
+
+    store = create_session_store(settings)
+    try:
+        assert (directory / "s1.json").exists() is not enabled
+        assert [m["content"] for m in store.get("s1")] == (["old"] if enabled else [])
+    finally:
+        store.close()
+
+
+def test_session_locks_serialize_turns_per_session():
+    events = []
+
+    async def turn(locks, session_id, name):
+        async with locks.hold(session_id):
+            events.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end {name}")
+
+    async def run():
+        locks = SessionLocks()
+        await asyncio.gather(turn(locks, "s1", "a"), turn(locks, "s1", "b"), turn(locks, "s2", "c"))
+        return locks
+
+    locks = asyncio.run(run())
+    assert events.index("end a") < events.index("start b")
+    # Another session does not wait for s1
+    assert events.index("start c") < events.index("end a")
+    assert locks._locks == {}
@@ -0,0 +1,17 @@
+import os
+
+from benchmarks.startup_budget import measure_once
+
+BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+
+def test_import_leaves_heavy_components_unbuilt():
+    sample = measure_once()
+    assert sample["eager_modules"] == []
+    assert not sample["rag_chain_built"]
+
+
+def test_import_time_within_budget():
+    # The fastest of a few runs: noise from a busy machine only ever adds time
+    fastest = min(measure_once()["seconds"] for _ in range(3))
+    assert fastest <= BUDGET_SECONDS, f"import time {fastest:.3f}s exceeds {BUDGET_SECONDS:.3f}s"
@@ -0,0 +1,75 @@
+import pytest
+
+from app.document_registry import document_id_for
+
+
+class FailingUpserts:
+    """Wraps a collection so that every upsert fails."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def upsert(self, **kwargs):
+        raise RuntimeError("disk full")
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def test_add_documents_registers_chunks_and_indexes_them(make_vector_store):
+    store = make_vector_store()
+    stats = store.add_documents("alpha beta gamma", {"filename": "a.txt"})
+    assert stats["embedded"] == 1
+    record = store.registry.find_by_filename("a.txt")
+    assert len(record.chunk_ids) == 1 and record.content_hash
+    assert store.lexical_search("beta")[0][0] == record.chunk_ids[0]
+    assert store.count() == 1
+
+
+def test_reupload_skips_stored_chunks(make_vector_store):
+    store = make_vector_store()
+    store.add_documents("alpha beta gamma", {"filename": "a.txt"})
+    stats = store.add_documents("alpha beta gamma", {"filename": "a.txt"})
+    assert stats["duplicates"] == 1 and stats["embedded"] == 0
+
+
+def test_failed_commit_rolls_back_registry_and_bm25(make_vector_store):
+    store = make_vector_store()
+    store.add_documents("kept text", {"filename": "kept.txt"})
+    collection = store.writer._get_collection
+    store.writer._get_collection = lambda: FailingUpserts(collection())
+
+    with pytest.raises(RuntimeError):
+        store.add_documents("lost text", {"filename": "lost.txt"})
+
+    assert store.registry.find_by_filename("lost.txt") is None
+    assert store.lexical_search("lost") == []
+    assert store.registry.find_by_filename("kept.txt") is not None
+    assert store.lexical_search("kept")
+
+    store.writer._get_collection = collection
+    stats = store.add_documents("lost text", {"filename": "lost.txt"})
+    assert stats["duplicates"] == 0
+    assert store.registry.find_by_filename("lost.txt") is not None
+
+
+def test_delete_document_removes_every_chunk(make_vector_store):
+    store = make_vector_store()
+    pages = [" ".join(f"page{page}word{i}" for i in range(300)) for page in (1, 2)]
+    store.add_documents(pages, [{"filename": "b.pdf", "page": 1}, {"filename": "b.pdf", "page": 2}])
+    record = store.registry.find_by_filename("b.pdf")
+    assert len(record.chunk_ids) > 2
+    assert store.delete_document(record.document_id) == len(record.chunk_ids)
+    assert store.count() == 0
+    assert store.lexical_search("page1word1") == []
+    assert store.delete_document(document_id_for("b.pdf")) is None
+
+
+def test_truncate_keeps_other_workers_collection_usable(make_vector_store):
+    mine, theirs = make_vector_store(), make_vector_store()
+    mine.add_documents("alpha beta", {"filename": "a.txt"})
+    assert theirs.truncate() == 1
+    assert mine.count() == 0
+    assert mine.registry.list() == []
+    mine.add_documents("gamma delta", {"filename": "b.txt"})
+    assert theirs.count() == 1
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from app.write_batcher import WriteBatcher
+
+
+class MemoryCollection:
+    """Just enough of a Chroma collection for the batcher."""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = []
+        self.fail = False
+        self.release = None
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.calls.append(("upsert", list(ids)))
+        for row in zip(ids, embeddings, documents, metadatas):
+            self.rows[row[0]] = row
+
+    def delete(self, ids):
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.calls.append(("delete", list(ids)))
+        for i in ids:
+            self.rows.pop(i, None)
+
+
+@pytest.fixture
+def collection():
+    return MemoryCollection()
+
+
+def make_batcher(collection, **kwargs):
+    options = dict(persist=lambda: None, max_batch_size=100, max_delay_seconds=60)
+    options.update(kwargs)
+    return WriteBatcher(get_collection=lambda: collection, **options)
+
+
+def upsert(batcher, *ids):
+    return batcher.upsert(list(ids), [[0.0]] * len(ids), list(ids), [{}] * len(ids))
+
+
+def test_writes_are_group_committed_in_order(collection):
+    commits = []
+    batcher = make_batcher(collection, on_commit=lambda: commits.append(1))
+    first, second, third = upsert(batcher, "a", "b"), batcher.delete(["a"]), upsert(batcher, "c")
+    batcher.flush()
+    assert [f.result(1) for f in (first, second, third)] == [2, 1, 1]
+    assert collection.calls == [("upsert", ["a", "b"]), ("delete", ["a"]), ("upsert", ["c"])]
+    assert set(collection.rows) == {"b", "c"}
+    assert commits == [1]
+    batcher.close()
+
+
+def test_batch_is_committed_once_max_batch_size_rows_are_pending(collection):
+    batcher = make_batcher(collection, max_batch_size=2)
+    assert upsert(batcher, "a", "b").result(5) == 2
+    batcher.close()
+
+
+def test_repeated_ids_in_one_batch_keep_the_latest_write(collection):
+    batcher = make_batcher(collection)
+    upsert(batcher, "a")
+    batcher.upsert(["a"], [[1.0]], ["new"], [{}])
+    batcher.flush()
+    assert collection.rows["a"][2] == "new"
+    batcher.close()
+
+
+def test_pending_state_includes_writes_being_committed(collection):
+    collection.release = threading.Event()
+    batcher = make_batcher(collection)
+    upsert(batcher, "a")
+    batcher.delete(["b"])
+    flusher = threading.Thread(target=batcher.flush)
+    flusher.start()
+    try:
+        assert batcher.pending_state(["a", "b", "c"]) == {"a": True, "b": False}
+    finally:
+        collection.release.set()
+        flusher.join(5)
+    assert batcher.pending_state(["a", "b"]) == {}
+    batcher.close()
+
+
+def test_failed_commit_reports_ids_and_fails_futures(collection):
+    failed = []
+
+    def on_failure(ids):
+        # Failed writes are no longer pending when the callback runs
+        assert batcher.pending_state(ids) == {}
+        failed.append(ids)
+
+    batcher = make_batcher(collection, on_failure=on_failure, on_commit=lambda: failed.append("commit"))
+    collection.fail = True
+    future = upsert(batcher, "a", "b")
+    batcher.delete(["a"])
+    batcher.flush()
+    with pytest.raises(RuntimeError):
+        future.result(1)
+    assert failed == [["a", "b"]]
+
+    collection.fail = False
+    future = upsert(batcher, "c")
+    batcher.flush()
+    assert future.result(1) == 1
+    assert failed == [["a", "b"], "commit"]
+    batcher.close()
+
+
+def test_close_commits_pending_writes_and_rejects_new_ones(collection):
+    batcher = make_batcher(collection)
+    future = upsert(batcher, "a")
+    batcher.close()
+    assert future.result(1) == 1
+    with pytest.raises(RuntimeError):
+        upsert(batcher, "b")